@@ -4,19 +4,33 @@ import argparse
 import boto3
 import botocore.config
 import botocore.exceptions
+import botocore.paginate
 import concurrent.futures
 import datetime
-import importlib.metadata
+import http.server
 import json
+import math
 import os
-import packaging.requirements
-import packaging.version
 import pathlib
+import random
+import re
 import sys
+import threading
+import time
 import traceback
 
+from modules import cardinality_sketches
 from modules import cloudtrail_parser
-from modules import cloudtrail_plotter
+from modules import discovery_cache
+from modules import event_database
+from modules import heavy_hitters
+from modules import ip_address_aggregator
+from modules import raw_cloudtrail_data
+from modules import result_sections
+from modules import runtime_environment
+from modules import sampling_estimator
+from modules import shared_rate_limiter
+from modules import user_agent_normalizer
 
 
 AWS_DEFAULT_REGION = "us-east-1"
@@ -30,39 +44,236 @@ TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
 
 SHOW_STATUS_MESSAGE_AFTER_NUMBER_OF_CLOUDTRAIL_LOG_RECORDS = 1000
 
+EVENT_DATABASE_BATCH_SIZE = 1000
 
-def increase_result_collection_counter(result_section, category, key):
+TOP_K_DEFAULT_SECTIONS = ["ip_addresses_by_principal", "user_agents_by_principal"]
+
+TOP_K_SECTION_CHOICES = result_sections.get_built_in_section_names() + result_sections.get_extra_section_names()
+
+PAGE_RETRY_BASE_BACKOFF_SECONDS = 1
+
+PAGE_RETRY_DEFAULT_ATTEMPTS = 8
+
+PAGE_RETRY_ERROR_CODES = (
+    "InternalFailure",
+    "InternalServerError",
+    "RequestLimitExceeded",
+    "RequestTimeout",
+    "ServiceUnavailable",
+    "ThrottlingException",
+    "TooManyRequestsException",
+)
+
+PAGE_RETRY_MAX_BACKOFF_SECONDS = 60
+
+REGION_NAME_REGEX = re.compile("[a-z]{2}(-[a-z]+)+-\\d+")
+
+SAMPLE_WINDOW_DEFAULT_MINUTES = 10
+
+SHARED_RATE_LIMIT_DEFAULT_REQUESTS_PER_SECOND = 2.0
+
+CUBE_HOUR_DIMENSION = "hour"
+
+WATCH_DEFAULT_PORT = 8765
+
+WATCH_POLL_OVERLAP = datetime.timedelta(minutes=15)
+
+
+def increase_result_collection_counter(collection, result_section, category, key):
     """
-    Increases the counter for the given key in the result collection structure by one. If the key does not exist yet,
-    it is created with a value of one.
+    Increases the counter for the given key in the given result collection structure by one. If the key does not exist
+    yet, it is created with a value of one.
     Example invocation:
-      increase_result_collection_counter("api_calls_by_region", "eu-central-1", "ec2.amazonaws.com:DescribeVolumes")
+      increase_result_collection_counter(
+          result_collection, "api_calls_by_region", "eu-central-1", "ec2.amazonaws.com:DescribeVolumes"
+      )
     """
+    if result_section in top_k_sections:
+        increase_top_k_counter(collection, result_section, category, key)
+        return
     try:
-        result_collection[result_section][category][key] += 1
+        collection[result_section][category][key] += 1
     except KeyError:
-        if category not in result_collection[result_section]:
-            result_collection[result_section][category] = {}
-        result_collection[result_section][category][key] = 1
+        if category not in collection[result_section]:
+            collection[result_section][category] = {}
+        collection[result_section][category][key] = 1
 
 
-def collect_cloudtrail_data_for_region(region):
+def get_empty_result_sections():
     """
-    Collects account activity recorded in CloudTrail for the given region. Adds the collected activity to the overall
-    result collection. If configured, dumps a copy of the raw CloudTrail data fetched.
+    Returns the sections of a result collection structure without any activity recorded, including the extra sections
+    configured.
+    """
+    return {result_section: {} for result_section in collected_result_sections}
+
+
+def get_result_sections_for_hour(result_sections_by_hour, event_time):
+    """
+    Returns the result sections that record the activity of the hour the given event time belongs to. The sections are
+    created if they do not exist yet.
+    """
+    hour = event_time.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    try:
+        return result_sections_by_hour[hour]
+    except KeyError:
+        return result_sections_by_hour.setdefault(hour, get_empty_result_sections())
+
+
+def merge_result_sections(target_sections, source_sections):
+    """
+    Adds the counters of the given source result sections to the given target result sections.
+    """
+    for result_section, categories in source_sections.items():
+        for category, counters in categories.items():
+            target_counters = target_sections[result_section].setdefault(category, {})
+            for key, count in counters.items():
+                target_counters[key] = target_counters.get(key, 0) + count
+
+
+def add_to_cardinality_sketches(principal, ip_address, user_agent, error_code):
+    """
+    Adds the given values to the cardinality sketches of the given principal. The sketches are created if they do not
+    exist yet.
+    """
+    try:
+        sketches = principal_cardinality_sketches[principal]
+    except KeyError:
+        sketches = principal_cardinality_sketches.setdefault(
+            principal,
+            {
+                "error_codes": cardinality_sketches.create_sketch(),
+                "ip_addresses": cardinality_sketches.create_sketch(),
+                "user_agents": cardinality_sketches.create_sketch(),
+            },
+        )
+    cardinality_sketches.add_value(sketches["ip_addresses"], ip_address)
+    cardinality_sketches.add_value(sketches["user_agents"], user_agent)
+    if error_code:
+        cardinality_sketches.add_value(sketches["error_codes"], error_code)
+
+
+def insert_into_event_database(rows):
+    """
+    Inserts the given rows into the event database. Access to the database is serialized among the threads of all
+    regions.
+    """
+    with event_database_lock:
+        event_database.insert_events(event_database_connection, rows)
+
+
+def add_to_activity_cube(cells):
+    """
+    Adds the given cells to the activity cube. Access to the cube is serialized among the threads of all regions.
+    """
+    with activity_cube_lock:
+        activity_cube.add_cells(account_activity_cube, cells)
+
+
+def increase_top_k_counter(collection, result_section, category, key):
+    """
+    Increases the counter for the given key in the result collection structure like increase_result_collection_counter,
+    but keeps at most the configured number of keys per category. Keys with low counts are evicted as needed, using
+    the Space-Saving algorithm.
+    """
+    with top_k_lock:
+        try:
+            summary = top_k_summaries[(result_section, category)]
+        except KeyError:
+            collection[result_section][category] = {}
+            summary = heavy_hitters.create_summary(collection[result_section][category], top_k_capacity)
+            top_k_summaries[(result_section, category)] = summary
+        heavy_hitters.add_item(summary, key)
+
+
+def get_top_k_metadata():
+    """
+    Returns a description of the approximation applied by the top-K counters, to be stored in the result collection
+    metadata.
+    """
+    top_k_metadata = {
+        "k": top_k_capacity,
+        "sections": {},
+    }
+    for result_section in sorted(top_k_sections):
+        section_summaries = [summary for (section, _), summary in top_k_summaries.items() if section == result_section]
+        top_k_metadata["sections"][result_section] = {
+            "categories_approximated": sum(1 for summary in section_summaries if heavy_hitters.get_max_error(summary)),
+            "max_count_overestimation": max(map(heavy_hitters.get_max_error, section_summaries), default=0),
+            "max_count_of_evicted_keys": max(
+                map(heavy_hitters.get_max_unmonitored_count, section_summaries), default=0
+            ),
+        }
+    return top_k_metadata
+
+
+def get_cloudtrail_paginator(region):
+    """
+    Returns a paginator for the LookupEvents API of CloudTrail in the given region. If configured, requests are subject
+    to the rate limit shared with other invocations. Creating the client takes a noticeable amount of time, so the
+    paginator is meant to be reused for all time ranges read from the region.
     """
     boto_session = boto3.Session(profile_name=args.profile, region_name=region)
     cloudtrail_client = boto_session.client("cloudtrail", config=BOTO_CLIENT_CONFIG)
-    cloudtrail_paginator = cloudtrail_client.get_paginator("lookup_events")
+    if args.shared_rate_limit:
+        rate_limit_file = shared_rate_limiter.get_rate_limit_file(account_id, region, "LookupEvents")
+        cloudtrail_client.meta.events.register(
+            "before-send.cloudtrail.LookupEvents",
+            lambda **kwargs: shared_rate_limiter.acquire_request_slot(rate_limit_file, args.shared_rate_limit),
+        )
+    return cloudtrail_client.get_paginator("lookup_events")
+
+
+def collect_cloudtrail_data_for_region(
+    region,
+    start_time,
+    end_time,
+    result_sections=None,
+    result_sections_by_hour=None,
+    seen_event_ids=None,
+    cloudtrail_paginator=None,
+):
+    """
+    Collects account activity recorded in CloudTrail for the given region and time range. Adds the collected activity
+    to the overall result collection or, if given, to the given result sections or to the result sections of the hour
+    the activity occurred in. Events whose IDs are contained in the given dict of seen event IDs are skipped, all
+    others are added to it. If configured, dumps a copy of the raw CloudTrail data fetched and stores the events in
+    the event database. Stops early if a configured time budget or event cap is reached. Returns True if all
+    CloudTrail data of the time range was read. A paginator of the region can be given to reuse its client.
+    """
+    if cloudtrail_paginator is None:
+        cloudtrail_paginator = get_cloudtrail_paginator(region)
     number_of_log_records_processed = -1
+    region_start_time = time.monotonic()
+    oldest_event_time_processed = None
+    limit_reached = None
+    completed = False
+    collection = result_collection if result_sections is None else result_sections
+    event_database_rows = []
+    activity_cube_cells = []
     if args.dump_raw_cloudtrail_data:
-        dump_file = open(os.path.join(raw_cloudtrail_data_directory, "{}.jsonl".format(region)), "w")
+        dump_file_name = raw_cloudtrail_data.get_dump_file(raw_cloudtrail_data_directory, region)
+        dump_file = open(dump_file_name, "wb")
+        dump_file_offset = 0
+        dump_index = {}
 
     # Iterate through CloudTrail logs
     try:
-        for response_page in cloudtrail_paginator.paginate(StartTime=from_timestamp, EndTime=run_timestamp):
+        for response_page in paginate_cloudtrail_events(cloudtrail_paginator, region, start_time, end_time):
             for event in response_page["Events"]:
+                # Stop if a configured time budget or event cap is reached
+                if collection_limits_configured:
+                    limit_reached = get_collection_limit_reached(region_start_time, number_of_log_records_processed + 1)
+                    if limit_reached:
+                        break
+
+                # Skip events that were processed by a previous poll already, if in watch mode
+                if seen_event_ids is not None:
+                    if event["EventId"] in seen_event_ids:
+                        continue
+                    seen_event_ids[event["EventId"]] = event["EventTime"]
+
                 number_of_log_records_processed += 1
+                oldest_event_time_processed = event["EventTime"]
                 log_record = json.loads(event["CloudTrailEvent"])
 
                 # Show regular status messages
@@ -75,9 +286,12 @@ def collect_cloudtrail_data_for_region(region):
                         )
                     print(msg)
 
-                # Dump log record, if configured
+                # Dump log record and record its position in the index of the dump file, if configured
                 if args.dump_raw_cloudtrail_data:
-                    dump_file.write("{}\n".format(json.dumps(log_record, separators=(",", ":"))))
+                    dump_line = "{}\n".format(json.dumps(log_record, separators=(",", ":"))).encode()
+                    dump_file.write(dump_line)
+                    raw_cloudtrail_data.add_to_index(dump_index, event["EventTime"], dump_file_offset, len(dump_line))
+                    dump_file_offset += len(dump_line)
 
                 # Skip certain types of activity, if configured
                 if args.activity_type != "ALL":
@@ -91,34 +305,440 @@ def collect_cloudtrail_data_for_region(region):
                 principal = cloudtrail_parser.get_principal_from_log_record(log_record)
                 api_call = cloudtrail_parser.get_api_call_from_log_record(log_record)
                 ip_address = cloudtrail_parser.get_ip_address_from_log_record(log_record)
+                if ip_address_prefix_lengths:
+                    ip_address = ip_address_aggregator.get_network_for_ip_address(
+                        ip_address, *ip_address_prefix_lengths
+                    )
                 user_agent = cloudtrail_parser.get_user_agent_from_log_record(log_record)
+                if args.user_agent_granularity != "RAW":
+                    user_agent = user_agent_normalizer.normalize_user_agent(user_agent, args.user_agent_granularity)
                 error_code = cloudtrail_parser.get_error_code_from_log_record(log_record)
+                fields = (principal, region, api_call, ip_address, user_agent, error_code)
+                if extra_field_extractors:
+                    fields += tuple(extract_field(log_record) for extract_field in extra_field_extractors)
+
+                # Increase counters in the result collection, or add event to the activity cube in batches per page
+                if args.aggregation_backend == "CUBE":
+                    activity_cube_cells.append(
+                        fields
+                        + (
+                            event["EventTime"]
+                            .astimezone(datetime.timezone.utc)
+                            .replace(minute=0, second=0, microsecond=0)
+                            .strftime(TIMESTAMP_FORMAT),
+                        )
+                    )
+                else:
+                    if result_sections_by_hour is not None:
+                        collection = get_result_sections_for_hour(result_sections_by_hour, event["EventTime"])
+                    for result_section, category_index, key_index in section_field_indexes:
+                        category = fields[category_index]
+                        key = fields[key_index]
+                        if category is not None and key is not None:
+                            increase_result_collection_counter(collection, result_section, category, key)
+                if args.cardinality_sketches:
+                    add_to_cardinality_sketches(principal, ip_address, user_agent, error_code)
+
+                # Store event in the event database in batches, if configured
+                if args.event_database:
+                    event_database_rows.append(
+                        event_database.get_event_row(
+                            event["EventId"],
+                            event["EventTime"],
+                            region,
+                            principal,
+                            api_call,
+                            ip_address,
+                            user_agent,
+                            error_code,
+                        )
+                    )
+                    if len(event_database_rows) >= EVENT_DATABASE_BATCH_SIZE:
+                        insert_into_event_database(event_database_rows)
+                        event_database_rows = []
+
+            if activity_cube_cells:
+                add_to_activity_cube(activity_cube_cells)
+                activity_cube_cells = []
+            if limit_reached:
+                break
+        completed = not limit_reached
 
-                # Increase counters in the result collection
-                increase_result_collection_counter("api_calls_by_principal", principal, api_call)
-                increase_result_collection_counter("api_calls_by_region", region, api_call)
-                increase_result_collection_counter("ip_addresses_by_principal", principal, ip_address)
-                increase_result_collection_counter("user_agents_by_principal", principal, user_agent)
-                if error_code:
-                    increase_result_collection_counter("error_codes_by_principal", principal, error_code)
+    except TimeBudgetExhausted:
+        limit_reached = "time_budget"
 
     except botocore.exceptions.ClientError as ex:
         error_message = ex.response["Error"]["Code"]
         print("Failed reading CloudTrail events from region {}: {}".format(region, error_message))
         result_collection["_metadata"]["regions_failed"][region] = error_message
-        return
+        return False
 
     except Exception as ex:
         print("Unexpected error in region {}.".format(region))
         print("Please report this as an issue along with the stack trace information.")
         print(traceback.format_exc())
-        return
+        result_collection["_metadata"]["regions_failed"][region] = "UnexpectedError: {}".format(type(ex).__name__)
+        return False
 
     finally:
         if args.dump_raw_cloudtrail_data:
             dump_file.close()
+            raw_cloudtrail_data.write_index(dump_index, dump_file_name)
+        if event_database_rows:
+            insert_into_event_database(event_database_rows)
+        if activity_cube_cells:
+            add_to_activity_cube(activity_cube_cells)
+
+        # Record the time range actually covered, as the collection may have stopped early
+        if collection_limits_configured:
+            if completed:
+                covered_from_time = start_time
+            else:
+                covered_from_time = oldest_event_time_processed or end_time
+            result_collection["_metadata"]["cloudtrail_data_analyzed_by_region"][region] = {
+                "from_timestamp": covered_from_time.strftime(TIMESTAMP_FORMAT),
+                "limit_reached": limit_reached,
+                "to_timestamp": end_time.strftime(TIMESTAMP_FORMAT),
+            }
+
+    if limit_reached:
+        print("Stopped region {} early: {} reached".format(region, limit_reached))
+    else:
+        print("Finished region {}".format(region))
+    return completed
+
+
+def paginate_cloudtrail_events(cloudtrail_paginator, region, start_time, end_time):
+    """
+    Yields pages of CloudTrail events of the given region and time range. Throttling and transient errors that persist
+    after the retries of the AWS SDK are retried with exponential backoff, resuming after the last page read instead of
+    starting over. If the pagination token expired meanwhile, reading resumes at the time of the oldest event read,
+    skipping the events that were yielded already. Retry statistics are recorded in the result collection. Raises
+    TimeBudgetExhausted if the configured time budget ends before the next retry.
+    """
+    query_end_time = end_time
+    pagination_config = {}
+    event_ids_to_skip = set()
+    oldest_event_time = None
+    event_ids_at_oldest_event_time = set()
+    attempt = 0
+    while True:
+        try:
+            for response_page in cloudtrail_paginator.paginate(
+                StartTime=start_time, EndTime=query_end_time, PaginationConfig=pagination_config
+            ):
+                attempt = 0
+                if event_ids_to_skip:
+                    response_page["Events"] = [
+                        event for event in response_page["Events"] if event["EventId"] not in event_ids_to_skip
+                    ]
+                yield response_page
+
+                # Remember where to resume
+                if response_page.get("NextToken"):
+                    pagination_config = {
+                        "StartingToken": botocore.paginate.TokenEncoder().encode(
+                            {"NextToken": response_page["NextToken"]}
+                        )
+                    }
+                for event in response_page["Events"]:
+                    if event["EventTime"] != oldest_event_time:
+                        oldest_event_time = event["EventTime"]
+                        event_ids_at_oldest_event_time = set()
+                    event_ids_at_oldest_event_time.add(event["EventId"])
+            return
+
+        except botocore.exceptions.ClientError as ex:
+            error_code = ex.response["Error"]["Code"]
+            last_exception = ex
+            if error_code == "InvalidNextTokenException" and pagination_config:
+                # Resume at the time of the oldest event read instead, or start over if no event was read yet
+                if oldest_event_time:
+                    query_end_time = oldest_event_time
+                    event_ids_to_skip = set(event_ids_at_oldest_event_time)
+                pagination_config = {}
+            elif error_code not in PAGE_RETRY_ERROR_CODES or attempt >= args.page_retry_attempts:
+                raise
+
+        except (botocore.exceptions.ConnectionError, botocore.exceptions.HTTPClientError) as ex:
+            error_code = type(ex).__name__
+            last_exception = ex
+            if attempt >= args.page_retry_attempts:
+                raise
+
+        # Back off before resuming, unless the time budget does not allow to
+        attempt += 1
+        backoff_seconds = random.uniform(0.5, 1) * min(
+            PAGE_RETRY_MAX_BACKOFF_SECONDS, PAGE_RETRY_BASE_BACKOFF_SECONDS * 2 ** (attempt - 1)
+        )
+        if collection_deadline and time.monotonic() + backoff_seconds >= collection_deadline:
+            raise TimeBudgetExhausted(region) from last_exception
+        retry_statistics = result_collection["_metadata"]["page_retries_by_region"].setdefault(
+            region, {"backoff_seconds": 0, "errors": {}, "retries": 0}
+        )
+        retry_statistics["backoff_seconds"] = round(retry_statistics["backoff_seconds"] + backoff_seconds, 1)
+        retry_statistics["errors"][error_code] = retry_statistics["errors"].get(error_code, 0) + 1
+        retry_statistics["retries"] += 1
+        print("Retrying to read CloudTrail events from region {} after {}".format(region, error_code))
+        time.sleep(backoff_seconds)
 
-    print("Finished region {}".format(region))
+
+def get_collection_limit_reached(region_start_time, number_of_log_records_processed):
+    """
+    Returns the name of the configured limit that stops the collection of CloudTrail data for a region, given the time
+    the collection for the region started and the number of log records processed for it so far. Returns None if no
+    limit is reached.
+    """
+    if args.region_event_cap and number_of_log_records_processed >= args.region_event_cap:
+        return "region_event_cap"
+    now = time.monotonic()
+    if collection_deadline and now >= collection_deadline:
+        return "time_budget"
+    if args.region_time_budget_minutes and now - region_start_time >= args.region_time_budget_minutes * 60:
+        return "region_time_budget"
+    return None
+
+
+def sample_cloudtrail_data_for_region(region):
+    """
+    Collects account activity recorded in CloudTrail for the given region within short sample windows that are spread
+    over the configured past hours. The activity of every sample window is kept separately, so that overall counts
+    can be extrapolated afterwards. Sample windows that failed are kept as None, excluding them from the extrapolation,
+    and their errors are recorded per sample window. The region is only listed as failed if all sample windows failed.
+    """
+    window_sections = sampled_result_sections_by_region[region]
+    cloudtrail_paginator = get_cloudtrail_paginator(region)
+    for window_index, (window_start_time, window_end_time) in enumerate(sample_windows):
+        result_sections = get_empty_result_sections()
+        if collect_cloudtrail_data_for_region(
+            region, window_start_time, window_end_time, result_sections, cloudtrail_paginator=cloudtrail_paginator
+        ):
+            window_sections.append(result_sections)
+        else:
+            window_sections.append(None)
+            error_message = result_collection["_metadata"]["regions_failed"].pop(region)
+            sample_window_regions_failed[window_index][region] = error_message
+    if all(result_sections is None for result_sections in window_sections):
+        result_collection["_metadata"]["regions_failed"][region] = error_message
+
+
+def watch_cloudtrail_data_for_regions(regions):
+    """
+    Continuously collects account activity recorded in CloudTrail for the given regions. Every poll only fetches the
+    events that occurred since the previous successful poll of a region, with some overlap to catch late deliveries.
+    Regions whose poll failed are polled from the same time again, such that no activity is lost. The result collection
+    is kept up to date for the rolling window of the configured past hours, is served via HTTP on localhost, and
+    replaces the snapshot file of the run after every poll. Runs until interrupted.
+    """
+    result_sections_by_hour = {}
+    seen_event_ids_by_region = {region: {} for region in regions}
+    cloudtrail_paginators_by_region = {region: get_cloudtrail_paginator(region) for region in regions}
+    poll_start_timestamps_by_region = {region: from_timestamp for region in regions}
+    snapshot_file = os.path.join(results_directory, "account_activity_{}_{}.json".format(account_id, run_timestamp_str))
+    temporary_snapshot_file = "{}.{}".format(snapshot_file, os.getpid())
+    summary_server = http.server.ThreadingHTTPServer(("127.0.0.1", args.watch_port), SummaryRequestHandler)
+    threading.Thread(target=summary_server.serve_forever, daemon=True).start()
+    print("Serving current summary on http://127.0.0.1:{}/".format(args.watch_port))
+
+    while True:
+        # Collect new CloudTrail data for all regions
+        poll_end_timestamp = datetime.datetime.now(datetime.timezone.utc)
+        result_collection["_metadata"]["regions_failed"] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(regions)) as executor:
+            poll_futures_by_region = {
+                region: executor.submit(
+                    collect_cloudtrail_data_for_region,
+                    region,
+                    poll_start_timestamps_by_region[region],
+                    poll_end_timestamp,
+                    None,
+                    result_sections_by_hour,
+                    seen_event_ids_by_region[region],
+                    cloudtrail_paginators_by_region[region],
+                )
+                for region in regions
+            }
+
+        # Drop activity that left the rolling window and rebuild the result sections from the remaining hours
+        window_start_hour = (poll_end_timestamp - datetime.timedelta(hours=args.past_hours)).replace(
+            minute=0, second=0, microsecond=0
+        )
+        for hour in list(result_sections_by_hour):
+            if hour < window_start_hour:
+                del result_sections_by_hour[hour]
+        rolling_result_sections = get_empty_result_sections()
+        for hour_result_sections in result_sections_by_hour.values():
+            merge_result_sections(rolling_result_sections, hour_result_sections)
+        result_collection.update(rolling_result_sections)
+        poll_timestamp_str = poll_end_timestamp.strftime(TIMESTAMP_FORMAT)
+        result_collection["_metadata"]["cloudtrail_data_analyzed"] = {
+            "from_timestamp": max(from_timestamp, window_start_hour).strftime(TIMESTAMP_FORMAT),
+            "to_timestamp": poll_timestamp_str,
+        }
+        result_collection["_metadata"]["run_timestamp"] = poll_timestamp_str
+
+        # Serve and write snapshot, replacing the snapshot of the previous poll atomically
+        SummaryRequestHandler.summary = json.dumps(result_collection, indent=2, sort_keys=True).encode()
+        with open(temporary_snapshot_file, "wb") as out_file:
+            out_file.write(SummaryRequestHandler.summary)
+        os.replace(temporary_snapshot_file, snapshot_file)
+        print("Snapshot written to {}".format(snapshot_file))
+
+        # Prepare next poll, which starts where the last successful poll of each region ended
+        for region, poll_future in poll_futures_by_region.items():
+            if poll_future.result():
+                poll_start_timestamps_by_region[region] = poll_end_timestamp - WATCH_POLL_OVERLAP
+            seen_event_ids = seen_event_ids_by_region[region]
+            for event_id, event_time in list(seen_event_ids.items()):
+                if event_time < poll_start_timestamps_by_region[region]:
+                    del seen_event_ids[event_id]
+        poll_duration = datetime.datetime.now(datetime.timezone.utc) - poll_end_timestamp
+        time.sleep(max(0, args.watch_interval_minutes * 60 - poll_duration.total_seconds()))
+
+
+class SummaryRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves the latest result collection snapshot as JSON document in watch mode.
+    """
+
+    summary = b"{}"
+
+    def do_GET(self):
+        if self.path not in ("/", "/summary"):
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.summary)))
+        self.end_headers()
+        self.wfile.write(self.summary)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TimeBudgetExhausted(Exception):
+    """
+    Raised when the configured time budget ends while waiting to retry reading CloudTrail data of a region.
+    """
+
+
+def parse_argument_directory(val):
+    """
+    Argument validator.
+    """
+    if not os.path.isdir(val):
+        raise argparse.ArgumentTypeError("Directory does not exist")
+    return val
+
+
+def parse_argument_cube_rollup(val):
+    """
+    Argument validator.
+    """
+    dimensions = tuple(val.split(":"))
+    if len(dimensions) != 2 or not all(dimensions):
+        raise argparse.ArgumentTypeError("Expected format: CATEGORY_DIMENSION:KEY_DIMENSION")
+    return dimensions
+
+
+def parse_argument_region(val):
+    """
+    Argument validator.
+    """
+    if not REGION_NAME_REGEX.fullmatch(val):
+        raise argparse.ArgumentTypeError("Invalid region name")
+    return val
+
+
+def parse_argument_top_k_error(val):
+    """
+    Argument validator.
+    """
+    top_k_error = float(val)
+    if not 0 < top_k_error < 1:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return top_k_error
+
+
+def parse_argument_ipv4_prefix_length(val):
+    """
+    Argument validator.
+    """
+    prefix_length = int(val)
+    if not 1 <= prefix_length <= 32:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return prefix_length
+
+
+def parse_argument_ipv6_prefix_length(val):
+    """
+    Argument validator.
+    """
+    prefix_length = int(val)
+    if not 1 <= prefix_length <= 128:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return prefix_length
+
+
+def parse_argument_sample_windows(val):
+    """
+    Argument validator.
+    """
+    windows = int(val)
+    if not 2 <= windows <= 1000:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return windows
+
+
+def parse_argument_watch_interval_minutes(val):
+    """
+    Argument validator.
+    """
+    minutes = int(val)
+    if not 1 <= minutes <= 1440:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return minutes
+
+
+def parse_argument_non_negative_integer(val):
+    """
+    Argument validator.
+    """
+    number = int(val)
+    if number < 0:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return number
+
+
+def parse_argument_positive_float(val):
+    """
+    Argument validator.
+    """
+    number = float(val)
+    if not number > 0:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return number
+
+
+def parse_argument_positive_integer(val):
+    """
+    Argument validator.
+    """
+    number = int(val)
+    if number < 1:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return number
+
+
+def parse_argument_port(val):
+    """
+    Argument validator.
+    """
+    port = int(val)
+    if not 1 <= port <= 65535:
+        raise argparse.ArgumentTypeError("Invalid value for argument")
+    return port
 
 
 def parse_argument_past_hours(val):
@@ -136,14 +756,12 @@ if __name__ == "__main__":
     if sys.version_info < (3, 10):
         print("Python version 3.10 or higher required")
         sys.exit(1)
-    with open(os.path.join(pathlib.Path(__file__).parent, "requirements.txt"), "r") as requirements_file:
-        for requirements_line in requirements_file.read().splitlines():
-            requirement = packaging.requirements.Requirement(requirements_line)
-            expected_version_specifier = requirement.specifier
-            installed_version = packaging.version.parse(importlib.metadata.version(requirement.name))
-            if installed_version not in expected_version_specifier:
-                print("Unfulfilled requirement: {}".format(requirements_line))
-                sys.exit(1)
+    unfulfilled_requirement = runtime_environment.get_unfulfilled_requirement(
+        os.path.join(pathlib.Path(__file__).parent, "requirements.txt")
+    )
+    if unfulfilled_requirement:
+        print("Unfulfilled requirement: {}".format(unfulfilled_requirement))
+        sys.exit(1)
 
     # Parse arguments
     parser = argparse.ArgumentParser()
@@ -153,12 +771,71 @@ if __name__ == "__main__":
         choices=["ALL", "SUCCESSFUL", "FAILED"],
         help="type of CloudTrail data to analyze: all API calls (default), only successful API calls, or only API calls that AWS declined with an error message",
     )
+    parser.add_argument(
+        "--aggregation-backend",
+        default="DICT",
+        choices=["DICT", "CUBE"],
+        help="how to count activity: nested dicts per result section (default), or a single NumPy count cube over principal, region, API call, IP address, user agent, error code and hour that all result sections are derived from",
+    )
+    parser.add_argument(
+        "--cardinality-sketches",
+        default=False,
+        action="store_true",
+        help="store mergeable HyperLogLog sketches of the distinct IP addresses, user agents and error codes per principal",
+    )
+    parser.add_argument(
+        "--cube-rollups",
+        nargs="+",
+        metavar="CATEGORY_DIMENSION:KEY_DIMENSION",
+        type=parse_argument_cube_rollup,
+        help="additional sections to derive from the count cube when using --aggregation-backend CUBE, e.g., principal:region or api_call:error_code",
+    )
+    parser.add_argument(
+        "--discovery-cache-minutes",
+        metavar="MINUTES",
+        type=parse_argument_positive_integer,
+        help="reuse the account ID, principal and enabled regions discovered for the profile within the given number of minutes, instead of calling STS and EC2 again",
+    )
     parser.add_argument(
         "--dump-raw-cloudtrail-data",
         default=False,
         action="store_true",
         help="store a copy of all gathered CloudTrail data in JSONL format",
     )
+    parser.add_argument(
+        "--event-database",
+        default=False,
+        action="store_true",
+        help="store one row per API call in a SQLite database, to answer ad-hoc questions without reading CloudTrail data again",
+    )
+    parser.add_argument(
+        "--extra-sections",
+        nargs="+",
+        default=[],
+        choices=result_sections.get_extra_section_names(),
+        help="additional result sections to collect in the same pass over the CloudTrail data",
+    )
+    parser.add_argument(
+        "--ipv4-prefix-length",
+        metavar="LENGTH",
+        type=parse_argument_ipv4_prefix_length,
+        help="roll up IPv4 addresses to networks of the given prefix length, e.g., 24, minimum: 1, maximum: 32",
+    )
+    parser.add_argument(
+        "--ipv6-prefix-length",
+        metavar="LENGTH",
+        type=parse_argument_ipv6_prefix_length,
+        help="roll up IPv6 addresses to networks of the given prefix length, e.g., 48, minimum: 1, maximum: 128",
+    )
+    parser.add_argument(
+        "--page-retry-attempts",
+        default=PAGE_RETRY_DEFAULT_ATTEMPTS,
+        metavar="ATTEMPTS",
+        type=parse_argument_non_negative_integer,
+        help="number of times to resume reading CloudTrail data of a region after throttling or transient errors, with exponential backoff, default: {}".format(
+            PAGE_RETRY_DEFAULT_ATTEMPTS
+        ),
+    )
     parser.add_argument(
         "--past-hours",
         default=336,
@@ -175,29 +852,250 @@ if __name__ == "__main__":
         "--profile",
         help="named AWS profile to use when running the command",
     )
+    parser.add_argument(
+        "--refresh-discovery-cache",
+        default=False,
+        action="store_true",
+        help="discover the account ID, principal and enabled regions again and update the cache used by --discovery-cache-minutes",
+    )
+    parser.add_argument(
+        "--region-event-cap",
+        metavar="EVENTS",
+        type=parse_argument_positive_integer,
+        help="stop reading CloudTrail data of a region after the given number of events, keeping the results so far",
+    )
+    parser.add_argument(
+        "--region-time-budget-minutes",
+        metavar="MINUTES",
+        type=parse_argument_positive_integer,
+        help="stop reading CloudTrail data of a region after the given number of minutes, keeping the results so far",
+    )
+    parser.add_argument(
+        "--regions",
+        nargs="+",
+        metavar="REGION",
+        type=parse_argument_region,
+        help="regions to analyze instead of all regions enabled in the account, e.g., eu-central-1 us-east-1",
+    )
+    parser.add_argument(
+        "--report-results",
+        default=False,
+        action="store_true",
+        help="generate a single HTML file with SVG charts that visualize the JSON output file",
+    )
+    parser.add_argument(
+        "--reuse-plots-from",
+        metavar="DIRECTORY",
+        type=parse_argument_directory,
+        help="plots directory of a previous run: plots whose data did not change are taken over instead of being rendered again",
+    )
+    parser.add_argument(
+        "--sample-window-minutes",
+        default=SAMPLE_WINDOW_DEFAULT_MINUTES,
+        metavar="MINUTES",
+        type=parse_argument_positive_integer,
+        help="length of each sample window when using --sample-windows, default: {}".format(
+            SAMPLE_WINDOW_DEFAULT_MINUTES
+        ),
+    )
+    parser.add_argument(
+        "--sample-windows",
+        metavar="WINDOWS",
+        type=parse_argument_sample_windows,
+        help="estimate activity from the given number of short sample windows spread over the past hours instead of reading all CloudTrail data, minimum: 2, maximum: 1000",
+    )
+    parser.add_argument(
+        "--shared-rate-limit",
+        metavar="REQUESTS_PER_SECOND",
+        nargs="?",
+        const=SHARED_RATE_LIMIT_DEFAULT_REQUESTS_PER_SECOND,
+        type=parse_argument_positive_float,
+        help="share the LookupEvents rate limit per account and region with all other invocations of the current user on this host, default when given without value: {} requests per second".format(
+            SHARED_RATE_LIMIT_DEFAULT_REQUESTS_PER_SECOND
+        ),
+    )
+    parser.add_argument(
+        "--time-budget-minutes",
+        metavar="MINUTES",
+        type=parse_argument_positive_integer,
+        help="stop reading CloudTrail data of all regions after the given number of minutes, keeping the results so far",
+    )
+    top_k_group = parser.add_mutually_exclusive_group()
+    top_k_group.add_argument(
+        "--top-k",
+        metavar="K",
+        type=parse_argument_positive_integer,
+        help="approximate the sections given in --top-k-sections by keeping only the K most frequent keys per principal or region, to bound memory usage",
+    )
+    top_k_group.add_argument(
+        "--top-k-error",
+        metavar="EPSILON",
+        type=parse_argument_top_k_error,
+        help="like --top-k, but with K derived from the maximum overestimation allowed, as fraction of the API calls of a principal or region",
+    )
+    parser.add_argument(
+        "--top-k-sections",
+        nargs="+",
+        default=TOP_K_DEFAULT_SECTIONS,
+        choices=TOP_K_SECTION_CHOICES,
+        help="sections to approximate when using --top-k or --top-k-error, default: ip_addresses_by_principal user_agents_by_principal",
+    )
+    parser.add_argument(
+        "--user-agent-granularity",
+        default="RAW",
+        choices=["RAW", "FAMILY", "MAJOR_VERSION", "PLATFORM"],
+        help="granularity of the user agents recorded: unchanged user agent strings (default), tool or SDK name only, name and major version, or name, major version and operating system",
+    )
+    parser.add_argument(
+        "--watch-interval-minutes",
+        metavar="MINUTES",
+        type=parse_argument_watch_interval_minutes,
+        help="keep running and poll for new CloudTrail data every MINUTES minutes, keeping a rolling summary of the past hours, minimum: 1, maximum: 1440",
+    )
+    parser.add_argument(
+        "--watch-port",
+        default=WATCH_DEFAULT_PORT,
+        type=parse_argument_port,
+        help="localhost port to serve the current summary on when using --watch-interval-minutes, default: {}".format(
+            WATCH_DEFAULT_PORT
+        ),
+    )
     args = parser.parse_args()
+    if args.aggregation_backend == "CUBE":
+        # Imported only here, as NumPy takes a noticeable share of the startup time
+        from modules import activity_cube
 
-    # Test for valid credentials
+        if not activity_cube.is_supported():
+            parser.error("argument --aggregation-backend: CUBE requires NumPy to be installed")
+        for incompatible_argument in ("sample_windows", "top_k", "top_k_error", "watch_interval_minutes"):
+            if getattr(args, incompatible_argument):
+                parser.error(
+                    "argument --{} not supported with --aggregation-backend CUBE".format(
+                        incompatible_argument.replace("_", "-")
+                    )
+                )
+        for cube_rollup in args.cube_rollups or []:
+            for dimension in cube_rollup:
+                if dimension not in result_sections.get_field_names() + [CUBE_HOUR_DIMENSION]:
+                    parser.error(
+                        "argument --cube-rollups: invalid dimension: {} (choose from {})".format(
+                            dimension, ", ".join(result_sections.get_field_names() + [CUBE_HOUR_DIMENSION])
+                        )
+                    )
+    elif args.cube_rollups:
+        parser.error("argument --cube-rollups requires --aggregation-backend CUBE")
+    if args.watch_interval_minutes:
+        for incompatible_argument in (
+            "cardinality_sketches",
+            "dump_raw_cloudtrail_data",
+            "event_database",
+            "plot_results",
+            "region_event_cap",
+            "region_time_budget_minutes",
+            "report_results",
+            "sample_windows",
+            "time_budget_minutes",
+            "top_k",
+            "top_k_error",
+        ):
+            if getattr(args, incompatible_argument):
+                parser.error(
+                    "argument --{} not supported with --watch-interval-minutes".format(
+                        incompatible_argument.replace("_", "-")
+                    )
+                )
+    for top_k_section in args.top_k_sections:
+        if top_k_section not in result_sections.get_built_in_section_names() + args.extra_sections:
+            parser.error(
+                "argument --top-k-sections: section not collected, add it via --extra-sections: {}".format(
+                    top_k_section
+                )
+            )
+    if args.shared_rate_limit and not shared_rate_limiter.is_supported():
+        parser.error("argument --shared-rate-limit not supported on this platform")
+    if args.sample_windows:
+        for incompatible_argument in (
+            "cardinality_sketches",
+            "dump_raw_cloudtrail_data",
+            "event_database",
+            "region_event_cap",
+            "region_time_budget_minutes",
+            "time_budget_minutes",
+            "top_k",
+            "top_k_error",
+        ):
+            if getattr(args, incompatible_argument):
+                parser.error(
+                    "argument --{} not supported with --sample-windows".format(incompatible_argument.replace("_", "-"))
+                )
+        if args.sample_windows * args.sample_window_minutes > args.past_hours * 60:
+            parser.error("argument --sample-windows: sample windows exceed the past hours")
+
+    # Test for valid credentials and get regions enabled in the account, unless recently cached
     try:
         boto_session = boto3.Session(profile_name=args.profile, region_name=AWS_DEFAULT_REGION)
     except botocore.exceptions.ProfileNotFound as ex:
         print("Error: {}".format(ex))
         sys.exit(1)
-    sts_client = boto_session.client("sts", config=BOTO_CLIENT_CONFIG)
-    try:
-        sts_response = sts_client.get_caller_identity()
-        account_id = sts_response["Account"]
-        account_principal = sts_response["Arn"]
-    except:
-        print("No or invalid AWS credentials configured")
-        sys.exit(1)
+    discovery = None
+    if args.discovery_cache_minutes and not args.refresh_discovery_cache:
+        discovery = discovery_cache.get_discovery(args.profile, args.discovery_cache_minutes * 60)
+    if discovery:
+        account_id = discovery["account_id"]
+        account_principal = discovery["account_principal"]
+        enabled_regions = discovery["enabled_regions"]
+    else:
+        sts_client = boto_session.client("sts", config=BOTO_CLIENT_CONFIG)
+        try:
+            sts_response = sts_client.get_caller_identity()
+            account_id = sts_response["Account"]
+            account_principal = sts_response["Arn"]
+        except:
+            print("No or invalid AWS credentials configured")
+            sys.exit(1)
+        if args.regions and not (args.discovery_cache_minutes or args.refresh_discovery_cache):
+            enabled_regions = None
+        else:
+            ec2_client = boto_session.client("ec2", config=BOTO_CLIENT_CONFIG)
+            ec2_response = ec2_client.describe_regions(AllRegions=False)
+            enabled_regions = sorted([region["RegionName"] for region in ec2_response["Regions"]])
+            if args.discovery_cache_minutes or args.refresh_discovery_cache:
+                discovery_cache.store_discovery(args.profile, account_id, account_principal, enabled_regions)
+    analyzed_regions = sorted(set(args.regions)) if args.regions else enabled_regions
 
     print("Analyzing account ID {}".format(account_id))
 
-    # Get regions enabled in the account
-    ec2_client = boto_session.client("ec2", config=BOTO_CLIENT_CONFIG)
-    ec2_response = ec2_client.describe_regions(AllRegions=False)
-    enabled_regions = sorted([region["RegionName"] for region in ec2_response["Regions"]])
+    # Prepare IP address rollup, if configured
+    if args.ipv4_prefix_length or args.ipv6_prefix_length:
+        ip_address_prefix_lengths = (args.ipv4_prefix_length, args.ipv6_prefix_length)
+    else:
+        ip_address_prefix_lengths = None
+
+    # Prepare top-K approximation, if configured
+    top_k_capacity = args.top_k or (math.ceil(1 / args.top_k_error) if args.top_k_error else None)
+    top_k_sections = set(args.top_k_sections) if top_k_capacity else set()
+    top_k_summaries = {}
+    top_k_lock = threading.Lock()
+    principal_cardinality_sketches = {}
+
+    # Prepare result sections, including the extra sections configured
+    collected_result_sections = result_sections.get_built_in_section_names() + args.extra_sections
+    event_fields = result_sections.get_fields(
+        collected_result_sections,
+        [
+            dimension
+            for cube_rollup in args.cube_rollups or []
+            for dimension in cube_rollup
+            if dimension != CUBE_HOUR_DIMENSION
+        ],
+    )
+    extra_field_extractors = result_sections.get_extra_field_extractors(event_fields)
+    section_field_indexes = result_sections.get_section_field_indexes(collected_result_sections, event_fields)
+
+    # Prepare activity cube, if configured
+    if args.aggregation_backend == "CUBE":
+        account_activity_cube = activity_cube.create_cube(event_fields + (CUBE_HOUR_DIMENSION,))
+        activity_cube_lock = threading.Lock()
 
     # Prepare result collection JSON structure
     run_timestamp = datetime.datetime.now(datetime.timezone.utc)
@@ -214,16 +1112,28 @@ if __name__ == "__main__":
                 "to_timestamp": run_timestamp_str,
             },
             "invocation": " ".join(sys.argv),
-            "regions_enabled": enabled_regions,
+            "page_retries_by_region": {},
             "regions_failed": {},
             "run_timestamp": run_timestamp_str,
         },
-        "api_calls_by_principal": {},
-        "api_calls_by_region": {},
-        "ip_addresses_by_principal": {},
-        "user_agents_by_principal": {},
-        "error_codes_by_principal": {},
+        **get_empty_result_sections(),
     }
+    if enabled_regions is not None:
+        result_collection["_metadata"]["regions_enabled"] = enabled_regions
+    if args.regions:
+        result_collection["_metadata"]["regions_analyzed"] = analyzed_regions
+    if discovery:
+        result_collection["_metadata"]["discovery_cached_at"] = datetime.datetime.fromtimestamp(
+            discovery["timestamp"], datetime.timezone.utc
+        ).strftime(TIMESTAMP_FORMAT)
+
+    # Prepare time budgets and event caps, if configured
+    collection_limits_configured = bool(
+        args.region_event_cap or args.region_time_budget_minutes or args.time_budget_minutes
+    )
+    if collection_limits_configured:
+        result_collection["_metadata"]["cloudtrail_data_analyzed_by_region"] = {}
+    collection_deadline = time.monotonic() + args.time_budget_minutes * 60 if args.time_budget_minutes else None
 
     # Prepare results directories
     results_directory = os.path.join(os.path.relpath(os.path.dirname(__file__) or "."), "results")
@@ -236,16 +1146,97 @@ if __name__ == "__main__":
             results_directory, "account_activity_{}_{}_raw_cloudtrail_data".format(account_id, run_timestamp_str)
         )
         os.mkdir(raw_cloudtrail_data_directory)
+    if args.event_database:
+        event_database_file = os.path.join(
+            results_directory, "account_activity_{}_{}.sqlite".format(account_id, run_timestamp_str)
+        )
+        event_database_connection = event_database.create_database(event_database_file)
+        event_database_lock = threading.Lock()
     if args.plot_results:
         plots_directory = os.path.join(
             results_directory, "account_activity_{}_{}_plots".format(account_id, run_timestamp_str)
         )
         os.mkdir(plots_directory)
 
-    # Collect CloudTrail data for all enabled regions
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(enabled_regions)) as executor:
-        for region in enabled_regions:
-            executor.submit(collect_cloudtrail_data_for_region, region)
+    # Keep collecting CloudTrail data for all enabled regions, if in watch mode
+    if args.watch_interval_minutes:
+        try:
+            watch_cloudtrail_data_for_regions(analyzed_regions)
+        except KeyboardInterrupt:
+            sys.exit(0)
+
+    # Collect CloudTrail data for all enabled regions, or estimate it from sample windows if configured
+    if args.sample_windows:
+        sample_windows = sampling_estimator.get_sample_windows(
+            from_timestamp, run_timestamp, args.sample_windows, datetime.timedelta(minutes=args.sample_window_minutes)
+        )
+        sampled_result_sections_by_region = {region: [] for region in analyzed_regions}
+        sample_window_regions_failed = [{} for _ in sample_windows]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(analyzed_regions)) as executor:
+            for region in analyzed_regions:
+                executor.submit(sample_cloudtrail_data_for_region, region)
+        estimated_result_sections, confidence_intervals = sampling_estimator.estimate_result_sections(
+            sampled_result_sections_by_region, args.past_hours * 60 / args.sample_windows / args.sample_window_minutes
+        )
+        result_collection.update(estimated_result_sections)
+        result_collection["confidence_intervals"] = confidence_intervals
+        result_collection["_metadata"]["estimation"] = {
+            "confidence_level": sampling_estimator.get_confidence_level(),
+            "method": "stratified_time_window_sampling",
+            "sample_windows": [
+                {
+                    "from_timestamp": window_start_time.strftime(TIMESTAMP_FORMAT),
+                    "regions_failed": regions_failed,
+                    "to_timestamp": window_end_time.strftime(TIMESTAMP_FORMAT),
+                }
+                for (window_start_time, window_end_time), regions_failed in zip(
+                    sample_windows, sample_window_regions_failed
+                )
+            ],
+        }
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(analyzed_regions)) as executor:
+            for region in analyzed_regions:
+                executor.submit(collect_cloudtrail_data_for_region, region, from_timestamp, run_timestamp)
+
+    # Derive result sections from the activity cube, if configured
+    if args.aggregation_backend == "CUBE":
+        for result_section in collected_result_sections:
+            result_collection[result_section] = activity_cube.get_projection(
+                account_activity_cube, *result_sections.get_section_fields(result_section)
+            )
+        if args.cube_rollups:
+            result_collection["cube_rollups"] = {
+                "{}_by_{}".format(key_dimension, category_dimension): activity_cube.get_projection(
+                    account_activity_cube, category_dimension, key_dimension
+                )
+                for category_dimension, key_dimension in args.cube_rollups
+            }
+        result_collection["_metadata"]["activity_cube"] = activity_cube.get_cube_statistics(account_activity_cube)
+
+    # Record aggregations and approximations applied, if any
+    if ip_address_prefix_lengths:
+        result_collection["_metadata"]["ip_address_prefix_lengths"] = {
+            "ipv4": ip_address_prefix_lengths[0],
+            "ipv6": ip_address_prefix_lengths[1],
+        }
+    if args.user_agent_granularity != "RAW":
+        cache_info = user_agent_normalizer.normalize_user_agent.cache_info()
+        result_collection["_metadata"]["user_agent_normalization"] = {
+            "cache_hits": cache_info.hits,
+            "cache_misses": cache_info.misses,
+            "granularity": args.user_agent_granularity,
+        }
+    if top_k_capacity:
+        result_collection["_metadata"]["top_k_approximation"] = get_top_k_metadata()
+    if args.cardinality_sketches:
+        result_collection["cardinality_sketches_by_principal"] = {
+            principal: {
+                dimension: cardinality_sketches.encode_sketch(sketch)
+                for dimension, sketch in principal_cardinality_sketches[principal].items()
+            }
+            for principal in principal_cardinality_sketches
+        }
 
     # Write results and print result locations
     result_file = os.path.join(results_directory, "account_activity_{}_{}.json".format(account_id, run_timestamp_str))
@@ -254,10 +1245,23 @@ if __name__ == "__main__":
     print("Output file written to {}".format(result_file))
     if args.dump_raw_cloudtrail_data:
         print("Raw CloudTrail data written to {}".format(raw_cloudtrail_data_directory))
+    if args.event_database:
+        event_database.finalize_database(event_database_connection)
+        print("Event database written to {}".format(event_database_file))
     if args.plot_results:
         if not result_collection["api_calls_by_principal"]:
             print("No API call activity to plot")
         else:
             print("Generating plots")
-            cloudtrail_plotter.generate_plot_files(result_collection, plots_directory)
+            from modules import cloudtrail_plotter  # Imported only here to keep the startup time of other runs short
+
+            cloudtrail_plotter.generate_plot_files(result_collection, plots_directory, args.reuse_plots_from)
             print("Plot files written to {}".format(plots_directory))
+    if args.report_results:
+        report_file = os.path.join(
+            results_directory, "account_activity_{}_{}_report.html".format(account_id, run_timestamp_str)
+        )
+        from modules import cloudtrail_reporter  # Imported only here to keep the startup time of other runs short
+
+        cloudtrail_reporter.generate_report_file(result_collection, report_file)
+        print("Report file written to {}".format(report_file))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import pathlib
+import random
+import sys
+import tempfile
+import time
+
+import matplotlib
+import matplotlib.image
+import numpy
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+from modules import cloudtrail_plotter
+
+
+# Label sets to draw the charts from, as most label sets recur across the plots of a run, e.g., the same few error
+# codes or API calls for many principals
+NUMBERS_OF_LABELS = [1, 1, 2, 3, 5, 10, 25, 41]
+
+
+def get_charts(number_of_charts, seed):
+    """
+    Returns a list of random (title, y axis labels, x axis bar sizes) tuples, shaped like the plots of a run after
+    truncation.
+    """
+    generator = random.Random(seed)
+    label_sets = []
+    for number_of_labels in NUMBERS_OF_LABELS:
+        label_sets.append(
+            tuple(
+                "{}:Operation{}".format(
+                    "".join(generator.choices("abcdefghijklmnopqrstuvwxyz-", k=generator.randint(2, 60))), index
+                )
+                for index in range(number_of_labels)
+            )
+        )
+    charts = []
+    for _ in range(number_of_charts):
+        y_axis_labels = generator.choice(label_sets)
+        x_axis_bar_sizes = tuple(
+            sorted(
+                (generator.randint(1, 10 ** generator.randint(1, 6)) for _ in y_axis_labels),
+                reverse=True,
+            )
+        )
+        principal = "112233445566:role/{}".format(
+            "".join(generator.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_+=,.@-", k=60))
+        )
+        plot_title = "API calls by principal '{}'".format(
+            cloudtrail_plotter._truncate_str(principal, cloudtrail_plotter._PLOT_MAX_LENGTH_LABELS)
+        )
+        charts.append((plot_title, y_axis_labels, x_axis_bar_sizes))
+    return charts
+
+
+def parse_argument_positive_integer(val):
+    """
+    Argument validator.
+    """
+    try:
+        val = int(val)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid integer value")
+    if val < 1:
+        raise argparse.ArgumentTypeError("Value must be at least 1")
+    return val
+
+
+def render_plot_file_with_pyplot(plot_title, y_axis_labels, x_axis_bar_sizes, output_file):
+    """
+    Renders a plot the way cloudtrail_plotter did before it reused figures, as a reference for time and pixels.
+    """
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=cloudtrail_plotter._PLOT_CANVAS_SIZE)
+    plt.title(plot_title, wrap=True, loc="left")
+    plt.barh(y=y_axis_labels, width=x_axis_bar_sizes, color=cloudtrail_plotter._PLOT_COLOR)
+    plt.gca().yaxis.set_inverted(True)
+    plt.gca().xaxis.get_major_locator().set_params(integer=True)
+    plt.tight_layout()
+    plt.savefig(output_file)
+    plt.close()
+
+
+if __name__ == "__main__":
+    # Parse arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--charts",
+        default=100,
+        type=parse_argument_positive_integer,
+        help="number of charts rendered per rendering path, default: 100",
+    )
+    parser.add_argument(
+        "--seed",
+        default=0,
+        type=int,
+        help="seed of the random chart data, default: 0",
+    )
+    args = parser.parse_args()
+    matplotlib.use("Agg")
+    charts = get_charts(args.charts, args.seed)
+
+    # Render all charts with both paths, after one unmeasured chart each that loads fonts and modules
+    render_times = {}
+    with tempfile.TemporaryDirectory() as output_directory:
+        for rendering_path, render_plot_file in (
+            ("pyplot", render_plot_file_with_pyplot),
+            ("reused_figure", cloudtrail_plotter._render_plot_file),
+        ):
+            os.mkdir(os.path.join(output_directory, rendering_path))
+            render_plot_file(*charts[0], os.path.join(output_directory, "warmup.png"))
+            start_time = time.perf_counter()
+            for index, chart in enumerate(charts):
+                render_plot_file(*chart, os.path.join(output_directory, rendering_path, "{}.png".format(index)))
+            render_times[rendering_path] = (time.perf_counter() - start_time) / len(charts) * 1000
+            print("{}: {:.1f} ms per chart".format(rendering_path, render_times[rendering_path]))
+        print("Speedup: {:.2f}x".format(render_times["pyplot"] / render_times["reused_figure"]))
+
+        # Compare pixels
+        differing_charts = []
+        for index in range(len(charts)):
+            pyplot_pixels = matplotlib.image.imread(os.path.join(output_directory, "pyplot", "{}.png".format(index)))
+            reused_figure_pixels = matplotlib.image.imread(
+                os.path.join(output_directory, "reused_figure", "{}.png".format(index))
+            )
+            if not numpy.array_equal(pyplot_pixels, reused_figure_pixels):
+                differing_charts.append(index)
+
+    # Print results
+    for index in differing_charts:
+        print("Error: Pixels of chart {} differ: {}".format(index, charts[index][0]))
+    sys.exit(1 if differing_charts else 0)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import pathlib
+import re
+import statistics
+import subprocess
+import sys
+
+
+ENTRY_POINTS = [
+    "aws_summarize_account_activity.py",
+    "detect_novel_activity.py",
+    "generate_plots_for_existing_json_file.py",
+    "merge_cardinality_sketches.py",
+    "query_event_database.py",
+    "read_raw_cloudtrail_data.py",
+]
+
+IMPORT_TIME_LINE_REGEX = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+LAZILY_IMPORTED_MODULES = [
+    "matplotlib",
+    "modules.activity_cube",
+    "modules.cloudtrail_plotter",
+    "modules.cloudtrail_reporter",
+    "numpy",
+    "packaging",
+    "sqlite3",
+]
+
+REPOSITORY_DIRECTORY = pathlib.Path(__file__).parent.parent
+
+
+def get_import_profile(entry_point):
+    """
+    Runs the given entry point with --help and returns the total import time in milliseconds along with the names of
+    all imported modules.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(REPOSITORY_DIRECTORY, entry_point), "--help"],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    import_time_microseconds = 0
+    imported_modules = set()
+    for line in process.stderr.splitlines():
+        captures = IMPORT_TIME_LINE_REGEX.match(line)
+        if not captures:
+            continue
+        if not captures.group(3):
+            import_time_microseconds += int(captures.group(2))
+        imported_modules.add(captures.group(4))
+    return import_time_microseconds / 1000, imported_modules
+
+
+def parse_argument_positive_integer(val):
+    """
+    Argument validator.
+    """
+    try:
+        val = int(val)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid integer value")
+    if val < 1:
+        raise argparse.ArgumentTypeError("Value must be at least 1")
+    return val
+
+
+if __name__ == "__main__":
+    # Parse arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--runs",
+        default=10,
+        type=parse_argument_positive_integer,
+        help="number of measured runs per entry point, default: 10",
+    )
+    parser.add_argument(
+        "--target-milliseconds",
+        default=400,
+        type=parse_argument_positive_integer,
+        help="maximum median import time per entry point in milliseconds, default: 400",
+    )
+    args = parser.parse_args()
+
+    # Measure import times, after one unmeasured run that fills the cache of the dependency check
+    failures = []
+    for entry_point in ENTRY_POINTS:
+        get_import_profile(entry_point)
+        import_times = []
+        for _ in range(args.runs):
+            import_time, imported_modules = get_import_profile(entry_point)
+            import_times.append(import_time)
+        median_import_time = statistics.median(import_times)
+        print(
+            "{}: median import time {:.1f} ms, minimum {:.1f} ms, maximum {:.1f} ms".format(
+                entry_point, median_import_time, min(import_times), max(import_times)
+            )
+        )
+        if median_import_time > args.target_milliseconds:
+            failures.append("{}: import time above target of {} ms".format(entry_point, args.target_milliseconds))
+        for module in LAZILY_IMPORTED_MODULES:
+            if module in imported_modules:
+                failures.append("{}: {} imported at startup".format(entry_point, module))
+
+    # Print results
+    for failure in failures:
+        print("Error: {}".format(failure))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+
+from modules import baseline_index
+from modules import runtime_environment
+
+
+if __name__ == "__main__":
+    # Check runtime environment
+    if sys.version_info < (3, 10):
+        print("Python version 3.10 or higher required")
+        sys.exit(1)
+    unfulfilled_requirement = runtime_environment.get_unfulfilled_requirement(
+        os.path.join(pathlib.Path(__file__).parent, "requirements.txt")
+    )
+    if unfulfilled_requirement:
+        print("Unfulfilled requirement: {}".format(unfulfilled_requirement))
+        sys.exit(1)
+
+    # Parse arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--baseline",
+        required=True,
+        metavar="FILE",
+        help="baseline index file of principals, API calls, IP addresses, user agents and error codes seen before",
+    )
+    parser.add_argument(
+        "--files",
+        required=True,
+        type=argparse.FileType("r"),
+        nargs="+",
+        help="JSON files to check for activity not contained in the baseline",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        default=False,
+        action="store_true",
+        help="add the activity of the given files to the baseline after checking them, creating the baseline if it does not exist yet",
+    )
+    args = parser.parse_args()
+    baseline_exists = os.path.isfile(args.baseline)
+    if not baseline_exists and not args.update_baseline:
+        parser.error("argument --baseline: file does not exist, create it via --update-baseline")
+
+    # Read files
+    result_collections = []
+    for file_name in args.files:
+        try:
+            result_collections.append(json.load(file_name))
+        except json.decoder.JSONDecodeError:
+            print("Error: Invalid JSON content: {}".format(file_name.name))
+            sys.exit(1)
+
+    # Print activity not contained in the baseline
+    if baseline_exists:
+        try:
+            index = baseline_index.open_index(args.baseline)
+        except ValueError:
+            print("Error: Not a baseline index file: {}".format(args.baseline))
+            sys.exit(1)
+        novel_items = {}
+        for result_collection in result_collections:
+            for novel_section, novel_values in baseline_index.get_novel_items(index, result_collection).items():
+                if isinstance(novel_values, list):
+                    novel_items.setdefault(novel_section, set()).update(novel_values)
+                    continue
+                novel_values_by_principal = novel_items.setdefault(novel_section, {})
+                for principal, values in novel_values.items():
+                    novel_values_by_principal.setdefault(principal, set()).update(values)
+
+        # Unmap the baseline, as it may be replaced below
+        del index
+        print(
+            json.dumps(
+                {
+                    novel_section: (
+                        sorted(novel_values)
+                        if isinstance(novel_values, set)
+                        else {principal: sorted(values) for principal, values in novel_values.items()}
+                    )
+                    for novel_section, novel_values in novel_items.items()
+                },
+                indent=2,
+                sort_keys=True,
+            )
+        )
+
+    # Update baseline, if configured
+    if args.update_baseline:
+        number_of_items_added = baseline_index.update_index(args.baseline, result_collections)
+        print(
+            "Baseline {} {}, {} items added".format(
+                args.baseline, "updated" if baseline_exists else "created", number_of_items_added
+            ),
+            file=sys.stderr,
+        )
@@ -1,34 +1,38 @@
 #!/usr/bin/env python3
 
 import argparse
-import importlib.metadata
 import json
 import os
-import packaging.requirements
-import packaging.version
 import pathlib
 import re
 import sys
 
-from modules import cloudtrail_plotter
+from modules import runtime_environment
 
 
 EXPECTED_FILE_FORMAT_REGEX = "account_activity_(\\d+)_(\\d+).json"
 
 
+def parse_argument_directory(val):
+    """
+    Argument validator.
+    """
+    if not os.path.isdir(val):
+        raise argparse.ArgumentTypeError("Directory does not exist")
+    return val
+
+
 if __name__ == "__main__":
     # Check runtime environment
     if sys.version_info < (3, 10):
         print("Python version 3.10 or higher required")
         sys.exit(1)
-    with open(os.path.join(pathlib.Path(__file__).parent, "requirements.txt"), "r") as requirements_file:
-        for requirements_line in requirements_file.read().splitlines():
-            requirement = packaging.requirements.Requirement(requirements_line)
-            expected_version_specifier = requirement.specifier
-            installed_version = packaging.version.parse(importlib.metadata.version(requirement.name))
-            if installed_version not in expected_version_specifier:
-                print("Unfulfilled requirement: {}".format(requirements_line))
-                sys.exit(1)
+    unfulfilled_requirement = runtime_environment.get_unfulfilled_requirement(
+        os.path.join(pathlib.Path(__file__).parent, "requirements.txt")
+    )
+    if unfulfilled_requirement:
+        print("Unfulfilled requirement: {}".format(unfulfilled_requirement))
+        sys.exit(1)
 
     # Parse arguments
     parser = argparse.ArgumentParser()
@@ -39,6 +43,18 @@ if __name__ == "__main__":
         nargs=1,
         help="JSON file to generate plots for",
     )
+    parser.add_argument(
+        "--output-format",
+        default="PNG",
+        choices=["PNG", "HTML"],
+        help="format to generate: one PNG file per plot (default) or a single HTML file with SVG charts",
+    )
+    parser.add_argument(
+        "--reuse-plots-from",
+        metavar="DIRECTORY",
+        type=parse_argument_directory,
+        help="plots directory of a previous run: plots whose data did not change are taken over instead of being rendered again",
+    )
     args = parser.parse_args()
     file_name = args.file[0]
 
@@ -64,6 +80,21 @@ if __name__ == "__main__":
         os.mkdir(results_directory)
     except FileExistsError:
         pass
+
+    # Write report file
+    if args.output_format == "HTML":
+        report_file = os.path.join(
+            results_directory, "account_activity_{}_{}_report.html".format(account_id, run_timestamp)
+        )
+        if os.path.exists(report_file):
+            print("Error: Destination already exists: {}".format(report_file))
+            sys.exit(1)
+        from modules import cloudtrail_reporter  # Imported only here, as only one of both output formats is needed
+
+        cloudtrail_reporter.generate_report_file(result_collection, report_file)
+        print("Report file written to {}".format(report_file))
+        sys.exit(0)
+
     plots_directory = os.path.join(results_directory, "account_activity_{}_{}_plots".format(account_id, run_timestamp))
     try:
         os.mkdir(plots_directory)
@@ -76,5 +107,7 @@ if __name__ == "__main__":
         print("No API call activity to plot")
     else:
         print("Generating plots")
-        cloudtrail_plotter.generate_plot_files(result_collection, plots_directory)
+        from modules import cloudtrail_plotter  # Imported only here, as only one of both output formats is needed
+
+        cloudtrail_plotter.generate_plot_files(result_collection, plots_directory, args.reuse_plots_from)
         print("Plot files written to {}".format(plots_directory))
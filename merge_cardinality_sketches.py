@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+
+from modules import cardinality_sketches
+from modules import runtime_environment
+
+
+ALL_PRINCIPALS_KEY = "_all_principals"
+
+
+if __name__ == "__main__":
+    # Check runtime environment
+    if sys.version_info < (3, 10):
+        print("Python version 3.10 or higher required")
+        sys.exit(1)
+    unfulfilled_requirement = runtime_environment.get_unfulfilled_requirement(
+        os.path.join(pathlib.Path(__file__).parent, "requirements.txt")
+    )
+    if unfulfilled_requirement:
+        print("Unfulfilled requirement: {}".format(unfulfilled_requirement))
+        sys.exit(1)
+
+    # Parse arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--files",
+        required=True,
+        type=argparse.FileType("r"),
+        nargs="+",
+        help="JSON files generated with --cardinality-sketches to combine, e.g., from different runs or accounts",
+    )
+    args = parser.parse_args()
+
+    # Merge sketches of all files
+    merged_sketches = {ALL_PRINCIPALS_KEY: {}}
+    for file_name in args.files:
+        try:
+            result_collection = json.load(file_name)
+            sketches_by_principal = result_collection["cardinality_sketches_by_principal"]
+        except json.decoder.JSONDecodeError:
+            print("Error: Invalid JSON content: {}".format(file_name.name))
+            sys.exit(1)
+        except KeyError:
+            print("Error: File does not contain cardinality sketches: {}".format(file_name.name))
+            sys.exit(1)
+        for principal, sketches in sketches_by_principal.items():
+            for dimension, encoded_sketch in sketches.items():
+                sketch = cardinality_sketches.decode_sketch(encoded_sketch)
+                for merge_key in (principal, ALL_PRINCIPALS_KEY):
+                    target_sketches = merged_sketches.setdefault(merge_key, {})
+                    try:
+                        cardinality_sketches.merge_sketches(target_sketches[dimension], sketch)
+                    except KeyError:
+                        target_sketches[dimension] = bytearray(sketch)
+
+    # Print estimated distinct counts
+    distinct_counts = {
+        principal: {
+            dimension: cardinality_sketches.get_estimate(sketch)
+            for dimension, sketch in merged_sketches[principal].items()
+        }
+        for principal in merged_sketches
+    }
+    print(json.dumps(distinct_counts, indent=2, sort_keys=True))
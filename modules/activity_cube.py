@@ -0,0 +1,124 @@
+try:
+    import numpy
+except ImportError:
+    # Optional dependency, only needed for the cube aggregation backend
+    numpy = None
+
+
+_CUBE_COMPACTION_THRESHOLD = 262144
+
+
+def add_cells(cube, cells):
+    """
+    Adds one to the count of each of the given cells of the cube. Cells are tuples with one value per dimension, in the
+    order the dimensions were given when creating the cube. The values are dictionary-encoded to integer codes, and the
+    codes are added to the cube in a single batch.
+    Example input:
+        [("112233445566:role/admin", "eu-central-1", "ec2.amazonaws.com:DescribeVolumes", "188.22.117.122",
+          "Boto3/1.34.68", None, "20250105140000")]
+    """
+    if not cells:
+        return
+    dictionaries = cube["dictionaries"]
+    codes = numpy.empty((len(cells), len(cube["dimensions"])), dtype=numpy.int32)
+    for dimension_index, values in enumerate(zip(*cells)):
+        dictionary = dictionaries[dimension_index]
+        codes[:, dimension_index] = [dictionary.setdefault(val, len(dictionary)) for val in values]
+    cube["pending_codes"].append(codes)
+    cube["number_of_pending_cells"] += len(cells)
+    if cube["number_of_pending_cells"] >= _CUBE_COMPACTION_THRESHOLD:
+        _compact_cube(cube)
+
+
+def create_cube(dimensions):
+    """
+    Returns an empty cube that counts events by the given dimensions. The cube is sparse: it stores the codes and counts
+    of the cells that occurred only.
+    Example input:
+        ("principal", "region", "api_call", "ip_address", "user_agent", "error_code", "hour")
+    """
+    return {
+        "codes": numpy.empty((0, len(dimensions)), dtype=numpy.int32),
+        "counts": numpy.empty(0, dtype=numpy.int64),
+        "dictionaries": [{} for _ in dimensions],
+        "dimensions": tuple(dimensions),
+        "number_of_pending_cells": 0,
+        "pending_codes": [],
+    }
+
+
+def get_cube_statistics(cube):
+    """
+    Returns the number of cells stored and the number of distinct values per dimension of the cube, to be stored in the
+    result collection metadata.
+    """
+    _compact_cube(cube)
+    return {
+        "cells": len(cube["counts"]),
+        "distinct_values": {
+            dimension: len(cube["dictionaries"][dimension_index])
+            for dimension_index, dimension in enumerate(cube["dimensions"])
+        },
+    }
+
+
+def get_projection(cube, category_dimension, key_dimension):
+    """
+    Returns the counts of the cube summed up over all dimensions except the two given ones, in the format of a result
+    section. Cells whose category or key value is None, such as the error code of a successful API call, are skipped.
+    Example input:
+        cube, "principal", "region"
+    Example output:
+        {"112233445566:role/admin": {"eu-central-1": 240, "us-east-1": 12}}
+    """
+    _compact_cube(cube)
+    category_index = cube["dimensions"].index(category_dimension)
+    key_index = cube["dimensions"].index(key_dimension)
+    category_values = list(cube["dictionaries"][category_index])
+    key_values = list(cube["dictionaries"][key_index])
+
+    # Sum up counts per pair of category and key, with both codes combined into a single integer
+    combined_codes = (
+        cube["codes"][:, category_index].astype(numpy.int64) * len(key_values) + cube["codes"][:, key_index]
+    )
+    unique_combined_codes, inverse = numpy.unique(combined_codes, return_inverse=True)
+    counts = numpy.bincount(inverse, weights=cube["counts"], minlength=len(unique_combined_codes))
+
+    projection = {}
+    category_codes, key_codes = numpy.divmod(unique_combined_codes, len(key_values) or 1)
+    for category_code, key_code, count in zip(category_codes.tolist(), key_codes.tolist(), counts.tolist()):
+        category = category_values[category_code]
+        key = key_values[key_code]
+        if category is None or key is None:
+            continue
+        projection.setdefault(category, {})[key] = int(count)
+    return projection
+
+
+def is_supported():
+    """
+    Returns True if NumPy, which the cube is built with, is installed.
+    """
+    return numpy is not None
+
+
+def _compact_cube(cube):
+    """
+    Merges the pending codes into the cells of the cube. Codes are sorted lexicographically, such that equal cells
+    become adjacent and their counts can be summed up.
+    """
+    if not cube["pending_codes"]:
+        return
+    codes = numpy.concatenate([cube["codes"]] + cube["pending_codes"])
+    counts = numpy.concatenate([cube["counts"], numpy.ones(cube["number_of_pending_cells"], dtype=numpy.int64)])
+    order = numpy.lexsort(codes.T[::-1])
+    codes = codes[order]
+    counts = counts[order]
+    is_new_cell = numpy.empty(len(codes), dtype=bool)
+    is_new_cell[:1] = True
+    numpy.any(codes[1:] != codes[:-1], axis=1, out=is_new_cell[1:])
+    cell_starts = numpy.flatnonzero(is_new_cell)
+    cube["codes"] = codes[cell_starts]
+    cube["counts"] = numpy.add.reduceat(counts, cell_starts)
+    cube["number_of_pending_cells"] = 0
+    cube["pending_codes"] = []
@@ -0,0 +1,147 @@
+import array
+import bisect
+import hashlib
+import mmap
+import os
+import sys
+
+
+_INDEX_FILE_HEADER = b"AWSABL01"
+
+_INDEX_HASH_BITS = 64
+
+# Result sections whose keys are recorded per principal
+_INDEX_SECTIONS = (
+    "api_calls_by_principal",
+    "ip_addresses_by_principal",
+    "user_agents_by_principal",
+    "error_codes_by_principal",
+)
+
+_INDEX_PRINCIPALS_SECTION = "principals"
+
+
+def get_item_hash(item):
+    """
+    Returns the 64-bit hash that represents the given item in a baseline index. A novel item is mistaken for a known
+    one with a probability of the number of known items divided by 2^64, e.g., less than one in a trillion for
+    10 million known items.
+    Example input:
+        ("112233445566:role/admin", "ip_addresses_by_principal", "188.22.117.122")
+    """
+    return int.from_bytes(
+        hashlib.blake2b("\0".join(item).encode(), digest_size=_INDEX_HASH_BITS // 8).digest(), "little"
+    )
+
+
+def get_items(result_collection):
+    """
+    Yields the (principal, section, key) tuples recorded in the given result collection, along with a
+    (principal, "principals", "") tuple for every principal.
+    Example output:
+        ("112233445566:role/admin", "principals", "")
+        ("112233445566:role/admin", "api_calls_by_principal", "ec2.amazonaws.com:DescribeVolumes")
+    """
+    for principal in result_collection["api_calls_by_principal"]:
+        yield (principal, _INDEX_PRINCIPALS_SECTION, "")
+    for result_section in _INDEX_SECTIONS:
+        for principal, counters in result_collection[result_section].items():
+            for key in counters:
+                yield (principal, result_section, key)
+
+
+def get_novel_items(index, result_collection):
+    """
+    Returns the items of the given result collection that the given baseline index does not contain, in the format
+    of result sections prefixed with "new_".
+    Example output:
+        {"new_principals": ["112233445566:role/admin"],
+         "new_ip_addresses_by_principal": {"112233445566:role/admin": ["188.22.117.122"]}, ...}
+    """
+    novel_items = {"new_{}".format(_INDEX_PRINCIPALS_SECTION): []}
+    for result_section in _INDEX_SECTIONS:
+        novel_items["new_{}".format(result_section)] = {}
+    for item in get_items(result_collection):
+        if index_contains(index, get_item_hash(item)):
+            continue
+        principal, result_section, key = item
+        if result_section == _INDEX_PRINCIPALS_SECTION:
+            novel_items["new_{}".format(result_section)].append(principal)
+        else:
+            novel_items["new_{}".format(result_section)].setdefault(principal, []).append(key)
+    return novel_items
+
+
+def index_contains(index, item_hash):
+    """
+    Returns True if the given baseline index contains the given item hash, using binary search.
+    """
+    position = bisect.bisect_left(index, item_hash)
+    return position < len(index) and index[position] == item_hash
+
+
+def open_index(index_file):
+    """
+    Returns the item hashes of the given baseline index file as a sorted sequence of integers. The file is
+    memory-mapped, such that lookups only read the pages of the file they touch. Returns an empty sequence if the
+    file does not exist.
+    """
+    try:
+        file = open(index_file, "rb")
+    except FileNotFoundError:
+        return array.array("Q")
+    with file:
+        if file.read(len(_INDEX_FILE_HEADER)) != _INDEX_FILE_HEADER:
+            raise ValueError("Not a baseline index file", index_file)
+        if os.fstat(file.fileno()).st_size == len(_INDEX_FILE_HEADER):
+            return array.array("Q")
+        mapped_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    index = memoryview(mapped_file)[len(_INDEX_FILE_HEADER) :]
+    if sys.byteorder == "little":
+        return index.cast("Q")
+    index = array.array("Q", index)
+    index.byteswap()
+    return index
+
+
+def update_index(index_file, result_collections):
+    """
+    Adds the items of the given result collections to the given baseline index file, which is created if it does not
+    exist yet. The new item hashes are inserted into the sorted hashes of the existing index, copying the runs of
+    existing hashes in between as a whole, and written to a new file, which then replaces the previous one. Returns
+    the number of hashes added.
+    """
+    new_item_hashes = sorted(
+        {get_item_hash(item) for result_collection in result_collections for item in get_items(result_collection)}
+    )
+    index = open_index(index_file)
+    number_of_item_hashes_added = 0
+    temporary_index_file = "{}.{}".format(index_file, os.getpid())
+    with open(temporary_index_file, "wb") as file:
+        file.write(_INDEX_FILE_HEADER)
+        position = 0
+        for item_hash in new_item_hashes:
+            next_position = bisect.bisect_left(index, item_hash, position)
+            _write_item_hashes(file, index[position:next_position])
+            position = next_position
+            if position < len(index) and index[position] == item_hash:
+                continue
+            _write_item_hashes(file, array.array("Q", [item_hash]))
+            number_of_item_hashes_added += 1
+        _write_item_hashes(file, index[position:])
+    if isinstance(index, memoryview):
+        mapped_file = index.obj
+        index.release()
+        mapped_file.close()
+    os.replace(temporary_index_file, index_file)
+    return number_of_item_hashes_added
+
+
+def _write_item_hashes(file, item_hashes):
+    """
+    Writes the given sequence of item hashes to the given index file in little-endian byte order.
+    """
+    if sys.byteorder != "little":
+        item_hashes = array.array("Q", item_hashes)
+        item_hashes.byteswap()
+    file.write(item_hashes)
@@ -0,0 +1,97 @@
+import base64
+import hashlib
+import math
+
+
+_SKETCH_HASH_BITS = 64
+
+_SKETCH_PRECISION = 10
+
+_SKETCH_DIMENSIONS_BY_SECTION = {
+    "error_codes_by_principal": "error_codes",
+    "ip_addresses_by_principal": "ip_addresses",
+    "user_agents_by_principal": "user_agents",
+}
+
+
+def add_value(sketch, value):
+    """
+    Adds the given string value to the given HyperLogLog sketch.
+    """
+    hash_value = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=_SKETCH_HASH_BITS // 8).digest(), "big")
+    remaining_bits = _SKETCH_HASH_BITS - _SKETCH_PRECISION
+    register_index = hash_value >> remaining_bits
+    rank = remaining_bits - (hash_value & ((1 << remaining_bits) - 1)).bit_length() + 1
+    if sketch[register_index] < rank:
+        sketch[register_index] = rank
+
+
+def create_sketch():
+    """
+    Returns a new, empty HyperLogLog sketch. The sketch estimates the number of distinct values added to it with a
+    standard error of about 3%, using one byte per register.
+    """
+    return bytearray(1 << _SKETCH_PRECISION)
+
+
+def decode_sketch(val):
+    """
+    Returns the sketch contained in the given string, as created by encode_sketch.
+    """
+    sketch = bytearray(base64.b64decode(val))
+    if len(sketch) != 1 << _SKETCH_PRECISION:
+        raise ValueError("Unsupported sketch size", len(sketch))
+    return sketch
+
+
+def encode_sketch(sketch):
+    """
+    Returns the given sketch as string that can be stored in JSON files.
+    """
+    return base64.b64encode(sketch).decode()
+
+
+def get_distinct_counts(data, result_section):
+    """
+    Returns a dict that maps the principals of the given result section to the number of distinct keys recorded for
+    them. The keys are counted, unless the section was approximated via top-K and the given CloudTrail data contains
+    cardinality sketches for it: then the counts are estimated from the sketches, which stay accurate regardless.
+    """
+    top_k_sections = data.get("_metadata", {}).get("top_k_approximation", {}).get("sections", {})
+    if (
+        not top_k_sections.get(result_section, {}).get("categories_approximated")
+        or result_section not in _SKETCH_DIMENSIONS_BY_SECTION
+        or "cardinality_sketches_by_principal" not in data
+    ):
+        return {principal: len(data[result_section][principal]) for principal in data[result_section]}
+    dimension = _SKETCH_DIMENSIONS_BY_SECTION[result_section]
+    sketches_by_principal = data["cardinality_sketches_by_principal"]
+    return {
+        principal: get_estimate(decode_sketch(sketches_by_principal[principal][dimension]))
+        for principal in data[result_section]
+    }
+
+
+def get_estimate(sketch):
+    """
+    Returns the estimated number of distinct values added to the given sketch.
+    """
+    number_of_registers = len(sketch)
+    alpha = 0.7213 / (1 + 1.079 / number_of_registers)
+    estimate = alpha * number_of_registers**2 / sum(2.0**-register for register in sketch)
+
+    # Apply linear counting for small cardinalities
+    empty_registers = sketch.count(0)
+    if estimate <= 2.5 * number_of_registers and empty_registers:
+        estimate = number_of_registers * math.log(number_of_registers / empty_registers)
+    return round(estimate)
+
+
+def merge_sketches(target_sketch, source_sketch):
+    """
+    Merges the given source sketch into the given target sketch. The target sketch afterwards estimates the number of
+    distinct values added to either of both sketches.
+    """
+    for register_index, register in enumerate(source_sketch):
+        if target_sketch[register_index] < register:
+            target_sketch[register_index] = register
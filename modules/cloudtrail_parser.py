@@ -521,6 +521,17 @@ def get_principal_from_log_record(log_record):
         raise ValueError("Unrecognized userIdentity format", log_record)
 
 
+def get_access_key_id_from_log_record(log_record):
+    """
+    Returns the ID of the access key that signed the API call of the given log record or None if there is none, e.g.,
+    for console sign-ins or calls made by AWS services.
+    """
+    try:
+        return log_record["userIdentity"]["accessKeyId"] or None
+    except KeyError:
+        return None
+
+
 def get_api_call_from_log_record(log_record):
     """
     Returns the API service and action name that is invoked in the given log record.
@@ -528,6 +539,18 @@ def get_api_call_from_log_record(log_record):
     return "{}:{}".format(log_record["eventSource"], log_record["eventName"])
 
 
+def get_console_login_result_from_log_record(log_record):
+    """
+    Returns "Success" or "Failure" if the given log record describes a console sign-in or None otherwise.
+    """
+    if log_record["eventName"] != "ConsoleLogin":
+        return None
+    try:
+        return log_record["responseElements"]["ConsoleLogin"]
+    except (KeyError, TypeError):
+        return "Unknown"
+
+
 def get_error_code_from_log_record(log_record):
     """
     Returns the error code contained in the given log record or None if there is no error code.
@@ -542,6 +565,16 @@ def get_error_code_from_log_record(log_record):
         return None
 
 
+def get_event_type_from_log_record(log_record):
+    """
+    Returns the type of event of the given log record, e.g., "AwsApiCall" or "AwsConsoleSignIn".
+    """
+    try:
+        return log_record["eventType"]
+    except KeyError:
+        return "Unknown"
+
+
 def get_ip_address_from_log_record(log_record):
     """
     Returns the source IP address contained in the given log record. Note that the value returned may
@@ -553,6 +586,17 @@ def get_ip_address_from_log_record(log_record):
         return "Unknown"
 
 
+def get_tls_version_from_log_record(log_record):
+    """
+    Returns the TLS version used for the API call of the given log record or None if it was not recorded, e.g., for
+    calls made by AWS services.
+    """
+    try:
+        return log_record["tlsDetails"]["tlsVersion"]
+    except (KeyError, TypeError):
+        return None
+
+
 def get_user_agent_from_log_record(log_record):
     """
     Returns the user agent string contained in the given log record.
@@ -563,6 +607,14 @@ def get_user_agent_from_log_record(log_record):
         return "Unknown"
 
 
+def get_vpc_endpoint_id_from_log_record(log_record):
+    """
+    Returns the ID of the VPC endpoint that the API call of the given log record was made through or None if it was
+    not made through a VPC endpoint.
+    """
+    return log_record.get("vpcEndpointId")
+
+
 def is_successful_api_call(log_record):
     """
     Returns True if the given log record describes a successful API call. Returns False if the log
@@ -1,6 +1,11 @@
-import matplotlib.pyplot as plt
+import hashlib
+import json
 import os
+import shutil
 import string
+import threading
+
+from modules import cardinality_sketches
 
 
 _PLOT_CANVAS_SIZE = (16, 8)
@@ -9,15 +14,29 @@ _PLOT_COLOR = "#e4af00"
 
 _PLOT_MAX_ITEMS = 40
 
+_PLOT_MANIFEST_FILE_NAME = "plot_manifest.json"
+
 _PLOT_MAX_LENGTH_LABELS = 85
 
 _PLOT_TRUNCATION_SEQUENCE = "[...]"
 
+# Figure, axes and layout cache of the plots rendered by the current thread, see _get_plot_figure
+_plot_figures = threading.local()
 
-def generate_plot_files(data, output_directory):
+
+def generate_plot_files(data, output_directory, previous_output_directory=None):
     """
     Generates plots that visualize the given CloudTrail data and writes them to the given directory as PNG files.
+    A manifest of the input data hashes of all plots is written alongside. If the output directory of a previous
+    invocation is given, plots whose input data and rendering parameters did not change are taken over from there
+    instead of being rendered again.
     """
+    plot_manifest = {
+        "output_directory": output_directory,
+        "previous_output_directory": previous_output_directory,
+        "previous_plot_hashes": _read_plot_manifest(previous_output_directory) if previous_output_directory else {},
+        "plot_hashes": {},
+    }
 
     # API calls by principal summary
     data_to_plot = {
@@ -29,6 +48,7 @@ def generate_plot_files(data, output_directory):
         data_to_plot,
         output_directory,
         "api_calls_by_principal_summary",
+        plot_manifest,
     )
 
     # API calls by principal
@@ -41,6 +61,7 @@ def generate_plot_files(data, output_directory):
             data_to_plot,
             api_calls_by_principal_dir,
             principal,
+            plot_manifest,
         )
 
     # API calls by region summary
@@ -52,6 +73,7 @@ def generate_plot_files(data, output_directory):
         data_to_plot,
         output_directory,
         "api_calls_by_region_summary",
+        plot_manifest,
     )
 
     # API calls by region
@@ -64,17 +86,17 @@ def generate_plot_files(data, output_directory):
             data_to_plot,
             api_calls_by_region_dir,
             region,
+            plot_manifest,
         )
 
     # IP addresses by principal summary
-    data_to_plot = {
-        principal: len(data["ip_addresses_by_principal"][principal]) for principal in data["ip_addresses_by_principal"]
-    }
+    data_to_plot = cardinality_sketches.get_distinct_counts(data, "ip_addresses_by_principal")
     _write_plot_file(
         "IP addresses by principal summary",
         data_to_plot,
         output_directory,
         "ip_addresses_by_principal_summary",
+        plot_manifest,
     )
 
     # IP addresses by principal
@@ -87,17 +109,17 @@ def generate_plot_files(data, output_directory):
             data_to_plot,
             ip_addresses_by_principal_dir,
             principal,
+            plot_manifest,
         )
 
     # User agents by principal summary
-    data_to_plot = {
-        principal: len(data["user_agents_by_principal"][principal]) for principal in data["user_agents_by_principal"]
-    }
+    data_to_plot = cardinality_sketches.get_distinct_counts(data, "user_agents_by_principal")
     _write_plot_file(
         "User agents by principal summary",
         data_to_plot,
         output_directory,
         "user_agents_by_principal_summary",
+        plot_manifest,
     )
 
     # User agents by principal
@@ -110,17 +132,17 @@ def generate_plot_files(data, output_directory):
             data_to_plot,
             user_agents_by_principal_dir,
             principal,
+            plot_manifest,
         )
 
     # Error codes by principal summary
-    data_to_plot = {
-        principal: len(data["error_codes_by_principal"][principal]) for principal in data["error_codes_by_principal"]
-    }
+    data_to_plot = cardinality_sketches.get_distinct_counts(data, "error_codes_by_principal")
     _write_plot_file(
         "Error codes by principal summary",
         data_to_plot,
         output_directory,
         "error_codes_by_principal_summary",
+        plot_manifest,
     )
 
     # Error codes by principal
@@ -133,8 +155,11 @@ def generate_plot_files(data, output_directory):
             data_to_plot,
             error_codes_by_principal_dir,
             principal,
+            plot_manifest,
         )
 
+    _write_plot_manifest(plot_manifest)
+
 
 def _dict_to_sorted_tuples(val):
     """
@@ -149,6 +174,148 @@ def _dict_to_sorted_tuples(val):
     return zip(*val_list)
 
 
+def _get_plot_hash(plot_title, dict_to_plot):
+    """
+    Returns a hash over the given plot input data and all parameters that influence the rendering of a plot.
+    """
+    import matplotlib
+
+    plot_parameters = (
+        plot_title,
+        dict_to_plot,
+        matplotlib.__version__,
+        _PLOT_CANVAS_SIZE,
+        _PLOT_COLOR,
+        _PLOT_MAX_ITEMS,
+        _PLOT_MAX_LENGTH_LABELS,
+        _PLOT_TRUNCATION_SEQUENCE,
+    )
+    return hashlib.sha256(json.dumps(plot_parameters, sort_keys=True).encode()).hexdigest()
+
+
+def _get_plot_figure():
+    """
+    Returns the figure that the current thread renders plots with, creating it on first use. The figure, its axes and
+    its canvas are reused for all plots, as setting them up again per plot makes up a large part of the rendering time.
+    Alongside, the y axis labels of the bars currently on the axes and a cache of computed layouts are kept.
+    """
+    try:
+        return _plot_figures.figure
+    except AttributeError:
+        pass
+
+    # matplotlib is only loaded once a plot actually needs to be rendered, so that the data helpers of this module
+    # remain usable without it. The object-oriented API is used instead of pyplot, which would track every figure in
+    # global state.
+    import matplotlib.backends.backend_agg
+    import matplotlib.figure
+
+    figure = matplotlib.figure.Figure(figsize=_PLOT_CANVAS_SIZE)
+    matplotlib.backends.backend_agg.FigureCanvasAgg(figure)
+    _plot_figures.figure = {
+        "axes": figure.add_subplot(),
+        "default_subplot_parameters": matplotlib.figure.SubplotParams(),
+        "figure": figure,
+        "layouts": {},
+        "y_axis_labels": None,
+    }
+    return _plot_figures.figure
+
+
+def _read_plot_manifest(output_directory):
+    """
+    Returns the plot hashes recorded in the manifest of the given plots directory. Returns an empty dict if there is
+    no readable manifest.
+    """
+    try:
+        with open(os.path.join(output_directory, _PLOT_MANIFEST_FILE_NAME), "r") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, json.decoder.JSONDecodeError):
+        return {}
+
+
+def _render_plot_file(plot_title, y_axis_labels, x_axis_bar_sizes, output_file):
+    """
+    Renders a horizontal bar chart with the given title, labels and bar sizes to the given PNG file. If the previous
+    plot of the current thread had the same labels, its bars are resized in place instead of being created again.
+    The tight layout, which requires measuring all labels, is only computed once per layout geometry: it depends on
+    the y axis labels, the height of the title and the extent of the x axis labels, which are cheap to measure.
+    """
+    plot_figure = _get_plot_figure()
+    figure = plot_figure["figure"]
+    axes = plot_figure["axes"]
+
+    # Lay out the axes as for a new figure, as measurements and the wrapping of the title depend on their position
+    default_subplot_parameters = plot_figure["default_subplot_parameters"]
+    figure.subplots_adjust(
+        left=default_subplot_parameters.left,
+        right=default_subplot_parameters.right,
+        bottom=default_subplot_parameters.bottom,
+        top=default_subplot_parameters.top,
+    )
+
+    # Draw bars
+    if y_axis_labels == plot_figure["y_axis_labels"]:
+        for bar, bar_size in zip(axes.patches, x_axis_bar_sizes):
+            bar.set_width(bar_size)
+        axes.relim()
+        axes.autoscale_view()
+    else:
+        axes.clear()
+        axes.barh(y=y_axis_labels, width=x_axis_bar_sizes, color=_PLOT_COLOR)
+        axes.yaxis.set_inverted(True)
+        axes.xaxis.get_major_locator().set_params(integer=True)
+        plot_figure["y_axis_labels"] = y_axis_labels
+    axes.set_title(plot_title, wrap=True, loc="left")
+
+    # Apply the tight layout. The tight layout only accounts for the horizontal center of the title, and for the x
+    # axis labels only as far as they exceed the axes.
+    renderer = figure.canvas.get_renderer()
+    axes_extent = axes.get_window_extent(renderer)
+    title_extent = axes.title.get_window_extent(renderer)
+    x_axis_extent = axes.xaxis.get_tightbbox(renderer, for_layout_only=True)
+    layout_key = (
+        y_axis_labels,
+        title_extent.y0,
+        title_extent.y1,
+        max((title_extent.x0 + title_extent.x1) / 2 - axes_extent.x1, 0),
+        max(axes_extent.x0 - x_axis_extent.x0, 0),
+        max(x_axis_extent.x1 - axes_extent.x1, 0),
+        x_axis_extent.y0,
+        x_axis_extent.y1,
+    )
+    try:
+        figure.subplots_adjust(**plot_figure["layouts"][layout_key])
+    except KeyError:
+        figure.tight_layout()
+        plot_figure["layouts"][layout_key] = {
+            "left": figure.subplotpars.left,
+            "right": figure.subplotpars.right,
+            "bottom": figure.subplotpars.bottom,
+            "top": figure.subplotpars.top,
+        }
+
+    figure.savefig(output_file)
+
+
+def _reuse_previous_plot_file(plot_manifest, relative_output_file, plot_hash):
+    """
+    Takes over the given plot file from the previous plots directory if it was rendered from identical input data.
+    The file is hard-linked if possible and copied otherwise. Returns True if the plot file was taken over.
+    """
+    if plot_manifest["previous_plot_hashes"].get(relative_output_file) != plot_hash:
+        return False
+    previous_file = os.path.join(plot_manifest["previous_output_directory"], relative_output_file)
+    output_file = os.path.join(plot_manifest["output_directory"], relative_output_file)
+    try:
+        os.link(previous_file, output_file)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        shutil.copyfile(previous_file, output_file)
+    return True
+
+
 def _str_to_filename(val):
     """
     Returns a string derived from the given string that has characters replaced that are invalid in many modern file
@@ -173,10 +340,11 @@ def _truncate_str(val, max_length):
     return val
 
 
-def _write_plot_file(plot_title, dict_to_plot, output_directory, output_file_name):
+def _write_plot_file(plot_title, dict_to_plot, output_directory, output_file_name, plot_manifest):
     """
     Writes a bar chart PNG file. The given dict keys represent the x axis data, the dict values the y axis. Characters
-    of the given output file name may be replaced to ensure valid file names.
+    of the given output file name may be replaced to ensure valid file names. The plot is recorded in the given plot
+    manifest and taken over from a previous plots directory if its input data did not change.
     """
     try:
         y_axis_labels, x_axis_bar_sizes = _dict_to_sorted_tuples(dict_to_plot)
@@ -184,19 +352,26 @@ def _write_plot_file(plot_title, dict_to_plot, output_directory, output_file_nam
         # There is no data to plot
         return
 
+    # Reuse the plot of a previous invocation, if possible
+    output_file = os.path.join(output_directory, _str_to_filename(output_file_name) + ".png")
+    relative_output_file = os.path.relpath(output_file, plot_manifest["output_directory"])
+    plot_hash = _get_plot_hash(plot_title, dict_to_plot)
+    plot_manifest["plot_hashes"][relative_output_file] = plot_hash
+    if _reuse_previous_plot_file(plot_manifest, relative_output_file, plot_hash):
+        return
+
     # Truncate data and labels, if necessary
     if len(y_axis_labels) > _PLOT_MAX_ITEMS:
         y_axis_labels = y_axis_labels[:_PLOT_MAX_ITEMS] + (_PLOT_TRUNCATION_SEQUENCE,)
         x_axis_bar_sizes = x_axis_bar_sizes[:_PLOT_MAX_ITEMS] + (0,)
     y_axis_labels = tuple(_truncate_str(val, _PLOT_MAX_LENGTH_LABELS) for val in y_axis_labels)
 
-    plt.figure(figsize=_PLOT_CANVAS_SIZE)
-    plt.title(plot_title, wrap=True, loc="left")
-    plt.barh(y=y_axis_labels, width=x_axis_bar_sizes, color=_PLOT_COLOR)
-    plt.gca().yaxis.set_inverted(True)
-    plt.gca().xaxis.get_major_locator().set_params(integer=True)
-    plt.tight_layout()
+    _render_plot_file(plot_title, y_axis_labels, x_axis_bar_sizes, output_file)
 
-    output_file = os.path.join(output_directory, _str_to_filename(output_file_name) + ".png")
-    plt.savefig(output_file)
-    plt.close()
+
+def _write_plot_manifest(plot_manifest):
+    """
+    Writes the hashes of all plots generated to the manifest file of the plots directory.
+    """
+    with open(os.path.join(plot_manifest["output_directory"], _PLOT_MANIFEST_FILE_NAME), "w") as manifest_file:
+        json.dump(plot_manifest["plot_hashes"], manifest_file, indent=2, sort_keys=True)
@@ -0,0 +1,129 @@
+import html
+
+from modules import cardinality_sketches
+from modules import cloudtrail_plotter
+
+
+_REPORT_BAR_HEIGHT = 14
+
+_REPORT_BAR_SPACING = 4
+
+_REPORT_CHART_WIDTH = 1200
+
+_REPORT_FONT_SIZE = 11
+
+_REPORT_LABEL_AREA_WIDTH = 560
+
+_REPORT_TITLE_HEIGHT = 24
+
+_REPORT_VALUE_AREA_WIDTH = 70
+
+_REPORT_SECTIONS = (
+    ("api_calls_by_principal", "API calls by principal", "API_CALL_TOTALS"),
+    ("api_calls_by_region", "API calls by region", "API_CALL_TOTALS"),
+    ("ip_addresses_by_principal", "IP addresses by principal", "DISTINCT_COUNTS"),
+    ("user_agents_by_principal", "User agents by principal", "DISTINCT_COUNTS"),
+    ("error_codes_by_principal", "Error codes by principal", "DISTINCT_COUNTS"),
+)
+
+_REPORT_STYLESHEET = """
+body { font-family: sans-serif; margin: 2em; }
+details { margin: 0.5em 0; }
+summary { cursor: pointer; font-weight: bold; }
+svg { display: block; margin: 1em 0; }
+rect { fill: {color}; }
+.label { text-anchor: end; }
+""".replace("{color}", cloudtrail_plotter._PLOT_COLOR)
+
+
+def generate_report_file(data, output_file):
+    """
+    Generates a single self-contained HTML file with inline SVG bar charts that visualize the given CloudTrail data
+    and writes it to the given file. The charts contain the same data as the PNG files of cloudtrail_plotter and follow
+    its sorting and truncation rules, but do not require matplotlib.
+    """
+    account_id = html.escape(data["_metadata"]["account_id"])
+    report_parts = [
+        "<!DOCTYPE html>\n<html>\n<head>\n<meta charset='utf-8'>\n",
+        "<title>Account activity {}</title>\n".format(account_id),
+        "<style>{}</style>\n</head>\n<body>\n".format(_REPORT_STYLESHEET),
+        "<h1>Account activity {}</h1>\n<ul>\n".format(account_id),
+    ]
+    for section, section_title, _ in _REPORT_SECTIONS:
+        report_parts.append("<li><a href='#{}'>{}</a></li>\n".format(section, section_title))
+    report_parts.append("</ul>\n")
+
+    for section, section_title, summary_type in _REPORT_SECTIONS:
+        report_parts.append("<h2 id='{}'>{}</h2>\n".format(section, section_title))
+
+        # Section summary
+        if summary_type == "API_CALL_TOTALS":
+            dict_to_plot = {category: sum(data[section][category].values()) for category in data[section]}
+        else:
+            dict_to_plot = cardinality_sketches.get_distinct_counts(data, section)
+        report_parts.append(_get_svg_chart("{} summary".format(section_title), dict_to_plot))
+
+        # Section details, collapsed to keep the report responsive for large accounts
+        report_parts.append("<details>\n<summary>{} details</summary>\n".format(section_title))
+        for category in data[section]:
+            chart_title = "{} '{}'".format(
+                section_title,
+                cloudtrail_plotter._truncate_str(category, cloudtrail_plotter._PLOT_MAX_LENGTH_LABELS),
+            )
+            report_parts.append(_get_svg_chart(chart_title, data[section][category]))
+        report_parts.append("</details>\n")
+
+    report_parts.append("</body>\n</html>\n")
+    with open(output_file, "w") as out_file:
+        out_file.write("".join(report_parts))
+
+
+def _get_svg_chart(chart_title, dict_to_plot):
+    """
+    Returns an SVG horizontal bar chart as string. The given dict keys represent the bar labels, the dict values the
+    bar sizes. Returns an empty string if there is no data to plot.
+    """
+    try:
+        labels, bar_sizes = cloudtrail_plotter._dict_to_sorted_tuples(dict_to_plot)
+    except ValueError:
+        # There is no data to plot
+        return ""
+
+    # Truncate data and labels, if necessary
+    if len(labels) > cloudtrail_plotter._PLOT_MAX_ITEMS:
+        labels = labels[: cloudtrail_plotter._PLOT_MAX_ITEMS] + (cloudtrail_plotter._PLOT_TRUNCATION_SEQUENCE,)
+        bar_sizes = bar_sizes[: cloudtrail_plotter._PLOT_MAX_ITEMS] + (0,)
+
+    bar_area_width = _REPORT_CHART_WIDTH - _REPORT_LABEL_AREA_WIDTH - _REPORT_VALUE_AREA_WIDTH
+    bar_scale = bar_area_width / (max(bar_sizes) or 1)
+    row_height = _REPORT_BAR_HEIGHT + _REPORT_BAR_SPACING
+    chart_height = _REPORT_TITLE_HEIGHT + row_height * len(labels)
+
+    svg_parts = [
+        "<svg xmlns='http://www.w3.org/2000/svg' width='{}' height='{}' font-size='{}'>".format(
+            _REPORT_CHART_WIDTH, chart_height, _REPORT_FONT_SIZE
+        ),
+        "<text x='0' y='{}' font-weight='bold'>{}</text>".format(_REPORT_FONT_SIZE + 4, html.escape(chart_title)),
+    ]
+    for index, (label, bar_size) in enumerate(zip(labels, bar_sizes)):
+        y = _REPORT_TITLE_HEIGHT + index * row_height
+        text_y = y + _REPORT_BAR_HEIGHT - 3
+        label = cloudtrail_plotter._truncate_str(label, cloudtrail_plotter._PLOT_MAX_LENGTH_LABELS)
+        svg_parts.append(
+            "<text x='{}' y='{}' class='label'>{}</text>"
+            "<rect x='{}' y='{}' width='{:.1f}' height='{}'/>"
+            "<text x='{:.1f}' y='{}'>{}</text>".format(
+                _REPORT_LABEL_AREA_WIDTH - 6,
+                text_y,
+                html.escape(label),
+                _REPORT_LABEL_AREA_WIDTH,
+                y,
+                bar_size * bar_scale,
+                _REPORT_BAR_HEIGHT,
+                _REPORT_LABEL_AREA_WIDTH + bar_size * bar_scale + 4,
+                text_y,
+                bar_size if index < cloudtrail_plotter._PLOT_MAX_ITEMS else "",
+            )
+        )
+    svg_parts.append("</svg>\n")
+    return "".join(svg_parts)
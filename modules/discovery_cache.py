@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import time
+
+from modules import runtime_environment
+
+
+_DISCOVERY_CACHE_FILE_FORMAT = "discovery_{}.json"
+
+# Environment variables that select the credentials used when no profile is given
+_CREDENTIAL_ENVIRONMENT_VARIABLES = ("AWS_PROFILE", "AWS_DEFAULT_PROFILE", "AWS_ACCESS_KEY_ID")
+
+
+def get_discovery(profile, max_age_seconds):
+    """
+    Returns the discovery results cached for the given profile, or None if there are none or they are older than the
+    given number of seconds.
+    Example output:
+        {"account_id": "112233445566", "account_principal": "arn:aws:iam::112233445566:user/testuser",
+         "enabled_regions": ["eu-central-1", "us-east-1"], "timestamp": 1736085075.2}
+    """
+    try:
+        with open(_get_discovery_cache_file(profile), "r") as file:
+            discovery = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not 0 <= time.time() - discovery.get("timestamp", 0) <= max_age_seconds:
+        return None
+    return discovery
+
+
+def store_discovery(profile, account_id, account_principal, enabled_regions):
+    """
+    Caches the given discovery results for the given profile. Failures to write the cache are ignored, as the results
+    can be discovered again.
+    """
+    discovery = {
+        "account_id": account_id,
+        "account_principal": account_principal,
+        "enabled_regions": enabled_regions,
+        "timestamp": time.time(),
+    }
+    try:
+        discovery_cache_file = _get_discovery_cache_file(profile)
+        temporary_discovery_cache_file = "{}.{}".format(discovery_cache_file, os.getpid())
+        file_descriptor = os.open(temporary_discovery_cache_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(file_descriptor, "w") as file:
+            json.dump(discovery, file)
+        os.replace(temporary_discovery_cache_file, discovery_cache_file)
+    except OSError:
+        pass
+
+
+def _get_discovery_cache_file(profile):
+    """
+    Returns the path of the file that caches discovery results for the given profile. Without profile, the credentials
+    are selected by environment variables, which are hashed into the file name as well.
+    """
+    credentials_source = hashlib.sha256(str(profile).encode())
+    if profile is None:
+        for environment_variable in _CREDENTIAL_ENVIRONMENT_VARIABLES:
+            credentials_source.update(b"\0")
+            credentials_source.update(os.environ.get(environment_variable, "").encode())
+    return os.path.join(
+        runtime_environment.get_cache_directory(),
+        _DISCOVERY_CACHE_FILE_FORMAT.format(credentials_source.hexdigest()[:32]),
+    )
@@ -0,0 +1,115 @@
+import datetime
+import pathlib
+
+from modules import result_sections
+
+
+_EVENT_COLUMNS = ("event_id", "event_time", "region", "principal", "api_call", "ip_address", "user_agent", "error_code")
+
+_EVENT_INDEXES = {
+    "events_by_api_call": ("api_call", "event_time"),
+    "events_by_event_time": ("event_time",),
+    "events_by_ip_address": ("ip_address", "event_time"),
+    "events_by_principal": ("principal", "event_time"),
+    "events_by_region": ("region", "event_time"),
+}
+
+_EVENT_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def create_database(database_file):
+    """
+    Creates a SQLite database with an empty events table in the given file and returns the connection to it. The
+    connection may be used by several threads, as long as the caller serializes access to it. As the database only
+    holds a copy of data available from CloudTrail, durability guarantees are relaxed in favor of insert speed.
+    """
+    # Imported only here to keep the startup time of runs without event database short
+    import sqlite3
+
+    connection = sqlite3.connect(database_file, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = OFF")
+    connection.execute(
+        "CREATE TABLE events (event_id TEXT PRIMARY KEY, {}) WITHOUT ROWID".format(
+            ", ".join("{} TEXT".format(column) for column in _EVENT_COLUMNS[1:])
+        )
+    )
+    connection.commit()
+    return connection
+
+
+def finalize_database(connection):
+    """
+    Creates the indexes of the events table and closes the given connection. Creating the indexes once after all
+    events were inserted is considerably faster than updating them on every insert. The write-ahead log is merged
+    into the database file, such that the file can be copied and opened on its own.
+    """
+    for index_name, index_columns in _EVENT_INDEXES.items():
+        connection.execute("CREATE INDEX {} ON events ({})".format(index_name, ", ".join(index_columns)))
+    connection.execute("ANALYZE")
+    connection.commit()
+    connection.execute("PRAGMA journal_mode = DELETE")
+    connection.close()
+
+
+def get_event_row(event_id, event_time, region, principal, api_call, ip_address, user_agent, error_code):
+    """
+    Returns a row for the events table. Event times are stored as UTC timestamps in ISO 8601 format, such that they
+    sort chronologically and can be used with the date and time functions of SQLite.
+    Example output:
+        ("5a6b2b7c-...", "2024-05-01T12:34:56Z", "eu-central-1", "112233445566:role/admin",
+         "ec2.amazonaws.com:DescribeVolumes", "188.22.117.122", "Boto3/1.34.68", None)
+    """
+    return (
+        event_id,
+        event_time.astimezone(datetime.timezone.utc).strftime(_EVENT_TIME_FORMAT),
+        region,
+        principal,
+        api_call,
+        ip_address,
+        user_agent,
+        error_code,
+    )
+
+
+def get_result_sections(connection):
+    """
+    Returns the built-in result sections of a result collection structure, derived from the events in the given
+    database. As during collection, events without a category or key, e.g., without error code, are not counted.
+    Example output:
+        {"api_calls_by_region": {"eu-central-1": {"ec2.amazonaws.com:DescribeVolumes": 240}}, ...}
+    """
+    sections = {}
+    for result_section in result_sections.get_built_in_section_names():
+        category_column, key_column = result_sections.get_section_fields(result_section)
+        sections[result_section] = {}
+        for category, key, count in connection.execute(
+            "SELECT {0}, {1}, COUNT(*) FROM events WHERE {0} IS NOT NULL AND {1} IS NOT NULL GROUP BY {0}, {1}".format(
+                category_column, key_column
+            )
+        ):
+            sections[result_section].setdefault(category, {})[key] = count
+    return sections
+
+
+def open_database(database_file):
+    """
+    Opens an existing event database in the given file for reading and returns the connection to it.
+    """
+    import sqlite3
+
+    return sqlite3.connect("{}?mode=ro".format(pathlib.Path(database_file).absolute().as_uri()), uri=True)
+
+
+def insert_events(connection, rows):
+    """
+    Inserts the given rows into the events table within a single transaction. Rows of events that are stored already
+    are ignored.
+    """
+    with connection:
+        connection.executemany(
+            "INSERT OR IGNORE INTO events ({}) VALUES ({})".format(
+                ", ".join(_EVENT_COLUMNS), ", ".join("?" for _ in _EVENT_COLUMNS)
+            ),
+            rows,
+        )
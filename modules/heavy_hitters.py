@@ -0,0 +1,85 @@
+def add_item(summary, key):
+    """
+    Counts one occurrence of the given key in the given Space-Saving summary. If the summary is at capacity and the key
+    is not monitored yet, the key with the lowest count is evicted and the new key takes over its count plus one.
+    Counts may thus be overestimated, but never by more than the lowest count monitored, which in turn never exceeds
+    the number of items added divided by the capacity.
+    """
+    counts = summary["counts"]
+    buckets = summary["buckets"]
+    summary["items_added"] += 1
+
+    # Key is monitored already
+    try:
+        count = counts[key]
+    except KeyError:
+        pass
+    else:
+        _move_key_to_bucket(summary, key, count, count + 1)
+        counts[key] = count + 1
+        return
+
+    # Key is not monitored yet and there is room left
+    if len(counts) < summary["capacity"]:
+        counts[key] = 1
+        buckets.setdefault(1, set()).add(key)
+        summary["min_count"] = 1
+        return
+
+    # Key replaces the key with the lowest count
+    min_count = summary["min_count"]
+    evicted_key = buckets[min_count].pop()
+    del counts[evicted_key]
+    summary["errors"].pop(evicted_key, None)
+    if not buckets[min_count]:
+        del buckets[min_count]
+        summary["min_count"] = min_count + 1
+    counts[key] = min_count + 1
+    summary["errors"][key] = min_count
+    buckets.setdefault(min_count + 1, set()).add(key)
+
+
+def create_summary(counts, capacity):
+    """
+    Returns a new Space-Saving summary that monitors at most the given number of keys. The counters are kept in the
+    given dict, so that it can be part of a result collection structure.
+    """
+    return {
+        "buckets": {},
+        "capacity": capacity,
+        "counts": counts,
+        "errors": {},
+        "items_added": 0,
+        "min_count": 0,
+    }
+
+
+def get_max_error(summary):
+    """
+    Returns the maximum amount by which a count of the given summary may be overestimated. This is zero as long as
+    no key had to be evicted.
+    """
+    return max(summary["errors"].values(), default=0)
+
+
+def get_max_unmonitored_count(summary):
+    """
+    Returns the maximum count a key that is not monitored by the given summary may have had. This is zero as long as
+    no key had to be evicted.
+    """
+    if not summary["errors"]:
+        return 0
+    return summary["min_count"]
+
+
+def _move_key_to_bucket(summary, key, old_count, new_count):
+    """
+    Moves the given key from the bucket of keys with the old count to the bucket of keys with the new count.
+    """
+    buckets = summary["buckets"]
+    buckets[old_count].discard(key)
+    if not buckets[old_count]:
+        del buckets[old_count]
+        if summary["min_count"] == old_count:
+            summary["min_count"] = new_count
+    buckets.setdefault(new_count, set()).add(key)
@@ -0,0 +1,29 @@
+import functools
+import ipaddress
+
+
+_NETWORK_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=_NETWORK_CACHE_SIZE)
+def get_network_for_ip_address(val, ipv4_prefix_length, ipv6_prefix_length):
+    """
+    Returns the network in CIDR notation that the given IP address belongs to, using the prefix length given for its
+    IP version. IP addresses of a version without prefix length, as well as values that are no IP addresses, such as
+    AWS service names or "AWS Internal", are returned unchanged.
+    Example input:
+        "188.22.117.122", 24, 48
+    Example output:
+        "188.22.117.0/24"
+    """
+    try:
+        ip_address = ipaddress.ip_address(val)
+    except ValueError:
+        return val
+    prefix_length = ipv4_prefix_length if ip_address.version == 4 else ipv6_prefix_length
+    if prefix_length is None:
+        return val
+    host_bits = ip_address.max_prefixlen - prefix_length
+    network_address = int(ip_address) >> host_bits << host_bits
+    return "{}/{}".format(type(ip_address)(network_address), prefix_length)
+
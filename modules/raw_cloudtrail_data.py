@@ -0,0 +1,116 @@
+import datetime
+import glob
+import json
+import mmap
+import os
+
+
+_DUMP_FILE_SUFFIX = ".jsonl"
+
+_INDEX_BUCKET_FORMAT = "%Y%m%d%H"
+
+_INDEX_BUCKET_LENGTH = datetime.timedelta(hours=1)
+
+_INDEX_FILE_SUFFIX = ".index.json"
+
+_LOG_RECORD_TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def add_to_index(index, event_time, offset, length):
+    """
+    Records in the given index that a log record with the given event time was written to the given byte range of a
+    dump file. The index maps hourly buckets to the byte range covering all log records of the hour. As CloudTrail
+    returns events ordered from newest to oldest, the log records of an hour are usually adjacent in the dump file.
+    Example output:
+        {"2025010514": [0, 48210], "2025010513": [48210, 97388]}
+    """
+    bucket = event_time.astimezone(datetime.timezone.utc).strftime(_INDEX_BUCKET_FORMAT)
+    try:
+        byte_range = index[bucket]
+    except KeyError:
+        index[bucket] = [offset, offset + length]
+        return
+    byte_range[0] = min(byte_range[0], offset)
+    byte_range[1] = max(byte_range[1], offset + length)
+
+
+def get_dump_file(raw_cloudtrail_data_directory, region):
+    """
+    Returns the path of the file that the raw CloudTrail data of the given region is dumped to.
+    """
+    return os.path.join(raw_cloudtrail_data_directory, "{}{}".format(region, _DUMP_FILE_SUFFIX))
+
+
+def read_log_records(raw_cloudtrail_data_directory, from_time=None, to_time=None, regions=None):
+    """
+    Yields the log records of the dump files in the given directory whose event time lies within the given time range,
+    the start being inclusive and the end exclusive. Dump files are memory-mapped, and only the byte ranges that the
+    index of a dump file lists for the hours of the time range are decoded. Dump files without index are decoded
+    completely. If regions are given, only the dump files of these regions are read.
+    """
+    from_time_str = from_time.astimezone(datetime.timezone.utc).strftime(_LOG_RECORD_TIME_FORMAT) if from_time else ""
+    to_time_str = to_time.astimezone(datetime.timezone.utc).strftime(_LOG_RECORD_TIME_FORMAT) if to_time else "~"
+    for dump_file in sorted(glob.glob(os.path.join(glob.escape(raw_cloudtrail_data_directory), "*.jsonl"))):
+        region = os.path.basename(dump_file)[: -len(_DUMP_FILE_SUFFIX)]
+        if regions and region not in regions:
+            continue
+        with open(dump_file, "rb") as file:
+            dump_file_size = os.fstat(file.fileno()).st_size
+            if not dump_file_size:
+                continue
+            try:
+                with open(_get_index_file(dump_file), "r") as index_file:
+                    byte_ranges = _get_byte_ranges(json.load(index_file), from_time, to_time)
+            except FileNotFoundError:
+                byte_ranges = [(0, dump_file_size)]
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as dump:
+                for start_offset, end_offset in byte_ranges:
+                    line_start_offset = start_offset
+                    while line_start_offset < end_offset:
+                        line_end_offset = dump.find(b"\n", line_start_offset, end_offset)
+                        if line_end_offset == -1:
+                            line_end_offset = end_offset
+                        log_record = json.loads(dump[line_start_offset:line_end_offset])
+                        line_start_offset = line_end_offset + 1
+                        if from_time_str <= log_record["eventTime"] < to_time_str:
+                            yield log_record
+
+
+def write_index(index, dump_file):
+    """
+    Writes the given index next to the given dump file.
+    """
+    with open(_get_index_file(dump_file), "w") as index_file:
+        json.dump({"buckets": index, "bucket_format": _INDEX_BUCKET_FORMAT}, index_file, sort_keys=True)
+
+
+def _get_byte_ranges(index, from_time, to_time):
+    """
+    Returns the sorted byte ranges of the given index whose hourly buckets overlap with the given time range. Adjacent
+    and overlapping byte ranges are merged.
+    """
+    byte_ranges = []
+    for bucket, byte_range in index["buckets"].items():
+        bucket_start_time = datetime.datetime.strptime(bucket, index["bucket_format"]).replace(
+            tzinfo=datetime.timezone.utc
+        )
+        if from_time and bucket_start_time + _INDEX_BUCKET_LENGTH <= from_time:
+            continue
+        if to_time and bucket_start_time >= to_time:
+            continue
+        byte_ranges.append(tuple(byte_range))
+
+    merged_byte_ranges = []
+    for start_offset, end_offset in sorted(byte_ranges):
+        if merged_byte_ranges and start_offset <= merged_byte_ranges[-1][1]:
+            merged_byte_ranges[-1][1] = max(merged_byte_ranges[-1][1], end_offset)
+        else:
+            merged_byte_ranges.append([start_offset, end_offset])
+    return merged_byte_ranges
+
+
+def _get_index_file(dump_file):
+    """
+    Returns the path of the index file of the given dump file.
+    """
+    return "{}{}".format(dump_file[: -len(_DUMP_FILE_SUFFIX)], _INDEX_FILE_SUFFIX)
@@ -0,0 +1,111 @@
+from modules import cloudtrail_parser
+
+
+# Fields extracted from every log record by the collection loop itself, as they depend on the region queried and on
+# the configured IP address rollup and user agent normalization
+_BASE_FIELDS = ("principal", "region", "api_call", "ip_address", "user_agent", "error_code")
+
+# Fields extracted from a log record only if a selected result section needs them
+_EXTRA_FIELD_EXTRACTORS = {
+    "access_key_id": cloudtrail_parser.get_access_key_id_from_log_record,
+    "console_login_result": cloudtrail_parser.get_console_login_result_from_log_record,
+    "event_type": cloudtrail_parser.get_event_type_from_log_record,
+    "tls_version": cloudtrail_parser.get_tls_version_from_log_record,
+    "vpc_endpoint_id": cloudtrail_parser.get_vpc_endpoint_id_from_log_record,
+}
+
+# Result sections always collected, defined by the field of their categories and the field of their keys
+_BUILT_IN_SECTIONS = {
+    "api_calls_by_principal": ("principal", "api_call"),
+    "api_calls_by_region": ("region", "api_call"),
+    "ip_addresses_by_principal": ("principal", "ip_address"),
+    "user_agents_by_principal": ("principal", "user_agent"),
+    "error_codes_by_principal": ("principal", "error_code"),
+}
+
+# Result sections collected on request, defined like the built-in ones
+_EXTRA_SECTIONS = {
+    "access_key_ids_by_principal": ("principal", "access_key_id"),
+    "api_calls_by_ip_address": ("ip_address", "api_call"),
+    "api_calls_by_user_agent": ("user_agent", "api_call"),
+    "api_calls_by_vpc_endpoint_id": ("vpc_endpoint_id", "api_call"),
+    "console_login_results_by_principal": ("principal", "console_login_result"),
+    "error_codes_by_api_call": ("api_call", "error_code"),
+    "error_codes_by_region": ("region", "error_code"),
+    "event_types_by_principal": ("principal", "event_type"),
+    "principals_by_api_call": ("api_call", "principal"),
+    "principals_by_ip_address": ("ip_address", "principal"),
+    "regions_by_principal": ("principal", "region"),
+    "tls_versions_by_principal": ("principal", "tls_version"),
+}
+
+
+def get_built_in_section_names():
+    """
+    Returns the names of the result sections that are always collected.
+    """
+    return list(_BUILT_IN_SECTIONS)
+
+
+def get_extra_field_extractors(fields):
+    """
+    Returns the functions that extract the given fields from a log record, for all fields that are not extracted by
+    the collection loop itself, in the order of the given fields.
+    """
+    return [_EXTRA_FIELD_EXTRACTORS[field] for field in fields[len(_BASE_FIELDS) :]]
+
+
+def get_extra_section_names():
+    """
+    Returns the names of the result sections that can be collected on request.
+    """
+    return list(_EXTRA_SECTIONS)
+
+
+def get_field_names():
+    """
+    Returns the names of all fields that can be extracted from a log record.
+    """
+    return list(_BASE_FIELDS) + sorted(_EXTRA_FIELD_EXTRACTORS)
+
+
+def get_fields(result_section_names, additional_fields=()):
+    """
+    Returns the fields to extract from every log record to collect the given result sections and the given additional
+    fields: first the fields extracted by the collection loop itself, then all others that are needed.
+    Example input:
+        ["api_calls_by_principal", "tls_versions_by_principal"]
+    Example output:
+        ("principal", "region", "api_call", "ip_address", "user_agent", "error_code", "tls_version")
+    """
+    fields = set(additional_fields)
+    for result_section in result_section_names:
+        fields.update(get_section_fields(result_section))
+    return _BASE_FIELDS + tuple(sorted(fields.difference(_BASE_FIELDS)))
+
+
+def get_section_field_indexes(result_section_names, fields):
+    """
+    Returns a list of (result section, category index, key index) tuples for the given result sections, with the
+    indexes of their category and key fields within the given fields. This allows to count an event in all result
+    sections without looking up field names per event.
+    Example output:
+        [("api_calls_by_principal", 0, 2), ("api_calls_by_region", 1, 2)]
+    """
+    section_field_indexes = []
+    for result_section in result_section_names:
+        category_field, key_field = get_section_fields(result_section)
+        section_field_indexes.append((result_section, fields.index(category_field), fields.index(key_field)))
+    return section_field_indexes
+
+
+def get_section_fields(result_section):
+    """
+    Returns the field of the categories and the field of the keys of the given result section.
+    Example output:
+        ("principal", "api_call")
+    """
+    try:
+        return _BUILT_IN_SECTIONS[result_section]
+    except KeyError:
+        return _EXTRA_SECTIONS[result_section]
@@ -0,0 +1,83 @@
+import hashlib
+import os
+import sys
+
+
+_CACHE_DIRECTORY_NAME = "aws-summarize-account-activity"
+
+_REQUIREMENTS_CHECK_CACHE_FILE_NAME = "requirements_check"
+
+
+def get_cache_directory():
+    """
+    Returns the directory to keep cached data of the current user in, following the XDG base directory specification.
+    The directory is created if it does not exist yet.
+    """
+    cache_directory = os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), _CACHE_DIRECTORY_NAME
+    )
+    os.makedirs(cache_directory, mode=0o700, exist_ok=True)
+    return cache_directory
+
+
+def get_unfulfilled_requirement(requirements_file):
+    """
+    Returns the first line of the given requirements file that the installed packages do not fulfill, or None if all
+    requirements are fulfilled. A successful check is cached and skipped on subsequent calls until the requirements
+    file, the Python interpreter or one of the directories packages are installed to changes.
+    """
+    with open(requirements_file, "r") as file:
+        requirements_lines = file.read().splitlines()
+
+    cache_key = _get_requirements_check_cache_key(requirements_lines)
+    cache_file = None
+    try:
+        cache_file = os.path.join(get_cache_directory(), _REQUIREMENTS_CHECK_CACHE_FILE_NAME)
+        with open(cache_file, "r") as file:
+            if file.read() == cache_key:
+                return None
+    except OSError:
+        pass
+
+    # Imported only here, as loading package metadata takes a noticeable share of the startup time
+    import importlib.metadata
+    import packaging.requirements
+    import packaging.version
+
+    for requirements_line in requirements_lines:
+        requirement = packaging.requirements.Requirement(requirements_line)
+        expected_version_specifier = requirement.specifier
+        installed_version = packaging.version.parse(importlib.metadata.version(requirement.name))
+        if installed_version not in expected_version_specifier:
+            return requirements_line
+
+    if cache_file is None:
+        return None
+    try:
+        temporary_cache_file = "{}.{}".format(cache_file, os.getpid())
+        with open(temporary_cache_file, "w") as file:
+            file.write(cache_key)
+        os.replace(temporary_cache_file, cache_file)
+    except OSError:
+        pass
+    return None
+
+
+def _get_requirements_check_cache_key(requirements_lines):
+    """
+    Returns a hash over the given requirements, the Python interpreter and the modification times of all directories
+    on the module search path. Installing, upgrading or removing a package changes the modification time of the
+    directory it is installed to, which invalidates the hash.
+    """
+    cache_key = hashlib.sha256()
+    for val in requirements_lines + [sys.executable, sys.version]:
+        cache_key.update(val.encode())
+        cache_key.update(b"\0")
+    for path in sys.path:
+        try:
+            modification_time = os.stat(path or ".").st_mtime_ns
+        except OSError:
+            continue
+        cache_key.update("{}:{}".format(path, modification_time).encode())
+        cache_key.update(b"\0")
+    return cache_key.hexdigest()
@@ -0,0 +1,88 @@
+import math
+import random
+
+
+_CONFIDENCE_LEVEL = 0.95
+
+_CONFIDENCE_Z_SCORE = 1.96
+
+
+def estimate_result_sections(window_sections_by_region, scale_factor):
+    """
+    Returns result sections with counts extrapolated from the result sections of sample windows, along with the
+    bounds of their confidence intervals. The given dict maps regions to lists of result sections, one per sample
+    window, with None for sample windows that could not be read. The scale factor is the ratio of the length of a
+    stratum to the length of a sample window. Counts are estimated per region, treating the sample windows read as
+    simple random sample of all windows of the time range, and then summed up over the regions.
+    Example output:
+        {"api_calls_by_region": {"eu-central-1": {"ec2.amazonaws.com:DescribeVolumes": 240}}},
+        {"api_calls_by_region": {"eu-central-1": {"ec2.amazonaws.com:DescribeVolumes": [180, 300]}}}
+    """
+    estimates = {}
+    variances = {}
+    observed_counts = {}
+    for window_sections in window_sections_by_region.values():
+        number_of_windows_in_time_range = scale_factor * len(window_sections)
+        window_sections = [result_sections for result_sections in window_sections if result_sections is not None]
+        number_of_windows = len(window_sections)
+        if not number_of_windows:
+            continue
+
+        # Gather the counts of every cell over all sample windows of the region
+        counts_by_cell = {}
+        for window_index, result_sections in enumerate(window_sections):
+            for result_section, categories in result_sections.items():
+                for category, counters in categories.items():
+                    for key, count in counters.items():
+                        cell = (result_section, category, key)
+                        counts_by_cell.setdefault(cell, [0] * number_of_windows)[window_index] = count
+
+        # Extrapolate counts and their variances
+        for cell, counts in counts_by_cell.items():
+            count_sum = sum(counts)
+            mean = count_sum / number_of_windows
+            sample_variance = (
+                sum((count - mean) ** 2 for count in counts) / (number_of_windows - 1) if number_of_windows > 1 else 0
+            )
+            estimates[cell] = estimates.get(cell, 0) + number_of_windows_in_time_range * mean
+            variances[cell] = variances.get(cell, 0) + (
+                number_of_windows_in_time_range**2
+                * max(0, 1 - number_of_windows / number_of_windows_in_time_range)
+                * sample_variance
+                / number_of_windows
+            )
+            observed_counts[cell] = observed_counts.get(cell, 0) + count_sum
+
+    estimated_sections = {}
+    confidence_intervals = {}
+    for cell, estimate in estimates.items():
+        result_section, category, key = cell
+        margin = _CONFIDENCE_Z_SCORE * math.sqrt(variances[cell])
+        estimated_sections.setdefault(result_section, {}).setdefault(category, {})[key] = round(estimate)
+        confidence_intervals.setdefault(result_section, {}).setdefault(category, {})[key] = [
+            max(observed_counts[cell], math.floor(estimate - margin)),
+            math.ceil(estimate + margin),
+        ]
+    return estimated_sections, confidence_intervals
+
+
+def get_confidence_level():
+    """
+    Returns the confidence level of the confidence intervals returned by estimate_result_sections.
+    """
+    return _CONFIDENCE_LEVEL
+
+
+def get_sample_windows(start_time, end_time, number_of_windows, window_length):
+    """
+    Returns a list of (start, end) tuples of sample windows of the given length. The time range between the given
+    start and end time is divided into strata of equal length, and one window is placed at a random offset within
+    each stratum.
+    """
+    stratum_length = (end_time - start_time) / number_of_windows
+    sample_windows = []
+    for stratum_index in range(number_of_windows):
+        stratum_start_time = start_time + stratum_index * stratum_length
+        window_start_time = stratum_start_time + random.random() * (stratum_length - window_length)
+        sample_windows.append((window_start_time, window_start_time + window_length))
+    return sample_windows
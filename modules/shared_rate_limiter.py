@@ -0,0 +1,61 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows
+    fcntl = None
+
+from modules import runtime_environment
+
+
+# Timestamps of the next free request slot further ahead are considered invalid, e.g., after the clock was set back
+_RATE_LIMIT_MAX_SECONDS_AHEAD = 60
+
+_RATE_LIMIT_DIRECTORY_NAME = "rate_limits"
+
+
+def acquire_request_slot(rate_limit_file, requests_per_second):
+    """
+    Blocks until the caller may send the next request under the given rate limit. The rate limit is shared by all
+    processes on the host that use the same rate limit file: the file holds the Unix timestamp of the next free request
+    slot and is locked exclusively while a slot is taken. A timestamp that lies implausibly far in the future, e.g.,
+    because the clock was set back since it was written, is discarded.
+    """
+    file_descriptor = os.open(rate_limit_file, os.O_RDWR)
+    try:
+        fcntl.flock(file_descriptor, fcntl.LOCK_EX)
+        try:
+            next_free_slot = float(os.pread(file_descriptor, 64, 0) or 0)
+        except ValueError:
+            next_free_slot = 0
+        now = time.time()
+        if next_free_slot > now + _RATE_LIMIT_MAX_SECONDS_AHEAD:
+            next_free_slot = now
+        request_slot = max(now, next_free_slot)
+        os.ftruncate(file_descriptor, 0)
+        os.pwrite(file_descriptor, repr(request_slot + 1 / requests_per_second).encode(), 0)
+    finally:
+        os.close(file_descriptor)
+    time.sleep(request_slot - now)
+
+
+def get_rate_limit_file(account_id, region, api_call):
+    """
+    Returns the path of the file that coordinates the rate limit for the given account, region and API call among all
+    processes of the current user on the host. The file is kept in the cache directory of the user, such that other
+    users cannot write to it, and is created if it does not exist yet.
+    """
+    rate_limit_directory = os.path.join(runtime_environment.get_cache_directory(), _RATE_LIMIT_DIRECTORY_NAME)
+    os.makedirs(rate_limit_directory, mode=0o700, exist_ok=True)
+    rate_limit_file = os.path.join(rate_limit_directory, "{}_{}_{}".format(account_id, region, api_call))
+    os.close(os.open(rate_limit_file, os.O_RDWR | os.O_CREAT, 0o600))
+    return rate_limit_file
+
+
+def is_supported():
+    """
+    Returns True if rate limits can be shared among processes on this platform.
+    """
+    return fcntl is not None
@@ -0,0 +1,61 @@
+import functools
+import re
+
+
+_NORMALIZATION_CACHE_SIZE = 65536
+
+_PLATFORM_PATTERNS = (
+    ("android", re.compile(r"android", re.IGNORECASE)),
+    ("ios", re.compile(r"\bos/ios\b|\biphone\b|\bipad\b", re.IGNORECASE)),
+    ("linux", re.compile(r"linux", re.IGNORECASE)),
+    ("macos", re.compile(r"darwin|mac_?os|mac os", re.IGNORECASE)),
+    ("windows", re.compile(r"windows|\bwin32\b|\bwin64\b", re.IGNORECASE)),
+)
+
+_PREFIX_TOKENS = ("apn", "hashicorp")
+
+_SEPARATORS_REGEX = re.compile(r"[\s,\[\]()]+")
+
+
+@functools.lru_cache(maxsize=_NORMALIZATION_CACHE_SIZE)
+def normalize_user_agent(val, granularity):
+    """
+    Returns a normalized form of the given user agent string at the given granularity: "FAMILY" keeps the name of the
+    tool or SDK only, "MAJOR_VERSION" adds its major version, and "PLATFORM" additionally adds the operating system.
+    Values that do not follow the "product/version" notation, such as "AWS Internal", are returned unchanged.
+    Example input:
+        "Boto3/1.34.68 md/Botocore#1.34.68 ua/2.0 os/windows#10 md/arch#amd64", "PLATFORM"
+    Example output:
+        "Boto3/1 (windows)"
+    """
+    try:
+        family, version = _get_product_token(val)
+    except ValueError:
+        return val
+    if granularity == "FAMILY":
+        return family
+
+    major_version = version.split(".", 1)[0]
+    if granularity == "MAJOR_VERSION":
+        return "{}/{}".format(family, major_version)
+
+    for platform, platform_pattern in _PLATFORM_PATTERNS:
+        if platform_pattern.search(val):
+            return "{}/{} ({})".format(family, major_version, platform)
+    return "{}/{}".format(family, major_version)
+
+
+def _get_product_token(val):
+    """
+    Returns the name and version of the product that the given user agent string identifies. Generic prefix tokens,
+    as for example put in front by Terraform, are skipped. Raises a ValueError if there is no product token.
+    Example input:
+        "APN/1.0 HashiCorp/1.0 Terraform/1.7.5 (+https://www.terraform.io) terraform-provider-aws/5.44.0"
+    Example output:
+        ("Terraform", "1.7.5")
+    """
+    for token in _SEPARATORS_REGEX.split(val):
+        name, separator, version = token.partition("/")
+        if separator and name and version and name.lower() not in _PREFIX_TOKENS:
+            return name, version
+    raise ValueError("No product token found", val)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+
+from modules import event_database
+from modules import runtime_environment
+
+
+def parse_argument_file(val):
+    """
+    Argument validator.
+    """
+    if not os.path.isfile(val):
+        raise argparse.ArgumentTypeError("File does not exist")
+    return val
+
+
+if __name__ == "__main__":
+    # Check runtime environment
+    if sys.version_info < (3, 10):
+        print("Python version 3.10 or higher required")
+        sys.exit(1)
+    unfulfilled_requirement = runtime_environment.get_unfulfilled_requirement(
+        os.path.join(pathlib.Path(__file__).parent, "requirements.txt")
+    )
+    if unfulfilled_requirement:
+        print("Unfulfilled requirement: {}".format(unfulfilled_requirement))
+        sys.exit(1)
+
+    # Parse arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--file",
+        required=True,
+        type=parse_argument_file,
+        help="SQLite file generated with --event-database to query",
+    )
+    parser.add_argument(
+        "--sql",
+        help="SQL query to run against the events table, printed as tab-separated values; without this argument, the result sections of the JSON output file are derived from the database and printed",
+    )
+    args = parser.parse_args()
+
+    # Run query
+    import sqlite3  # Imported only here to keep the startup time short
+
+    connection = event_database.open_database(args.file)
+    try:
+        if not args.sql:
+            print(json.dumps(event_database.get_result_sections(connection), indent=2, sort_keys=True))
+            sys.exit(0)
+        cursor = connection.execute(args.sql)
+        print("\t".join(column[0] for column in cursor.description or []))
+        for row in cursor:
+            print("\t".join("" if val is None else str(val) for val in row))
+    except sqlite3.Error as ex:
+        print("Error: {}".format(ex))
+        sys.exit(1)
+    finally:
+        connection.close()
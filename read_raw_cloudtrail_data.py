@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime
+import json
+import os
+import pathlib
+import sys
+
+from modules import raw_cloudtrail_data
+from modules import runtime_environment
+
+
+TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
+
+
+def parse_argument_directory(val):
+    """
+    Argument validator.
+    """
+    if not os.path.isdir(val):
+        raise argparse.ArgumentTypeError("Directory does not exist")
+    return val
+
+
+def parse_argument_timestamp(val):
+    """
+    Argument validator.
+    """
+    try:
+        return datetime.datetime.strptime(val, TIMESTAMP_FORMAT).replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected format: YYYYMMDDhhmmss")
+
+
+if __name__ == "__main__":
+    # Check runtime environment
+    if sys.version_info < (3, 10):
+        print("Python version 3.10 or higher required")
+        sys.exit(1)
+    unfulfilled_requirement = runtime_environment.get_unfulfilled_requirement(
+        os.path.join(pathlib.Path(__file__).parent, "requirements.txt")
+    )
+    if unfulfilled_requirement:
+        print("Unfulfilled requirement: {}".format(unfulfilled_requirement))
+        sys.exit(1)
+
+    # Parse arguments
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--directory",
+        required=True,
+        type=parse_argument_directory,
+        help="directory with raw CloudTrail data generated with --dump-raw-cloudtrail-data",
+    )
+    parser.add_argument(
+        "--from-timestamp",
+        metavar="TIMESTAMP",
+        type=parse_argument_timestamp,
+        help="only read CloudTrail data from the given UTC timestamp on, format: YYYYMMDDhhmmss",
+    )
+    parser.add_argument(
+        "--regions",
+        nargs="+",
+        metavar="REGION",
+        help="only read CloudTrail data of the given regions, e.g., eu-central-1 us-east-1",
+    )
+    parser.add_argument(
+        "--to-timestamp",
+        metavar="TIMESTAMP",
+        type=parse_argument_timestamp,
+        help="only read CloudTrail data before the given UTC timestamp, format: YYYYMMDDhhmmss",
+    )
+    args = parser.parse_args()
+
+    # Print log records in JSONL format
+    try:
+        for log_record in raw_cloudtrail_data.read_log_records(
+            args.directory, args.from_timestamp, args.to_timestamp, args.regions
+        ):
+            print(json.dumps(log_record, separators=(",", ":")))
+    except BrokenPipeError:
+        # Output was piped to a command that exited early, e.g., head
+        sys.stdout = None